@@ -1,4 +1,5 @@
-from typing import List
+from itertools import chain
+from typing import Iterator, List, Tuple
 import re
 
 # Split into "paragraph-like" blocks first (PDF text often loses real newlines,
@@ -16,48 +17,149 @@ _CLAUSE_SPLIT = re.compile(
     r"(?:(?<=\s)|^)(?:\(?[a-zA-Z]\)|[0-9]{1,3}\.|[0-9]{1,3}\))\s+"
 )
 
+_SPACES = re.compile(r"[ \t]{2,}|\t")  # runs that [ \t]+ -> " " would change
+
+# Characters that may start a sentence after a split (lookahead of _SENT_SPLIT)
+_SENT_START = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789\"'(")
+_SENT_END = frozenset(".!?")
+
+Span = Tuple[int, int]
+
 def _normalize_whitespace(text: str) -> str:
     # Keep single newlines if present; collapse other whitespace
     text = text.replace("\r\n", "\n")
-    # Collapse spaces/tabs but keep newlines
-    text = re.sub(r"[ \t]+", " ", text)
+    # Collapse spaces/tabs but keep newlines (single spaces are left alone)
+    if "\t" in text or "  " in text:
+        text = _SPACES.sub(" ", text)
     return text.strip()
 
-def _split_into_units(text: str) -> List[str]:
+def _strip_span(text: str, s: int, e: int) -> Span:
+    """Span equivalent of text[s:e].strip()."""
+    while s < e and text[s].isspace():
+        s += 1
+    while e > s and text[e - 1].isspace():
+        e -= 1
+    return s, e
+
+def _unit_spans(text: str) -> Iterator[Span]:
     """
-    Try to split text into "meaning units" (best effort):
+    Meaning units as (start, end) spans of the normalized text (best effort):
     1) Paragraph-like blocks (if double newlines exist)
     2) Clause-like splits (numbered/bulleted) inside each block
     3) Sentence split fallback
-    """
-    text = _normalize_whitespace(text)
-    if not text:
-        return []
 
-    # If we have paragraph boundaries, use them
-    blocks = _PAR_SPLIT.split(text)
-    units: List[str] = []
-
-    for b in blocks:
-        b = b.strip()
-        if not b:
+    Same units as splitting + stripping each piece, without building the pieces.
+    Blocks are matched in place with pos/endpos; a block start always follows
+    whitespace, so _CLAUSE_SPLIT's (?<=\s) there behaves like ^ on a sliced block.
+    """
+    n = len(text)
+    pos = 0
+    for sep in chain(_PAR_SPLIT.finditer(text), (None,)):
+        bs, be = pos, (sep.start() if sep else n)
+        pos = sep.end() if sep else n
+
+        bs, be = _strip_span(text, bs, be)
+        if bs == be:
             continue
 
-        # If clause markers exist, split by them while keeping content intact.
-        # _CLAUSE_SPLIT finds the marker positions; we reconstruct chunks.
-        parts = _CLAUSE_SPLIT.split(b)
-        parts = [p.strip() for p in parts if p and p.strip()]
+        # Clause pieces start right after a marker's trailing \s+, so only
+        # their ends need stripping.
+        parts: List[Span] = []
+        s = bs
+        for m in _CLAUSE_SPLIT.finditer(text, bs, be):
+            e = m.start()
+            while e > s and text[e - 1].isspace():
+                e -= 1
+            if e > s:
+                parts.append((s, e))
+            s = m.end()
+        if s < be:
+            parts.append((s, be))
 
         if len(parts) >= 2:
             # Clause split worked; treat each clause as a unit
-            units.extend(parts)
+            yield from parts
+        else:
+            # Fallback: sentence split (pieces never carry outer whitespace)
+            s = bs
+            for m in _SENT_SPLIT.finditer(text, bs, be):
+                yield s, m.start()
+                s = m.end()
+            yield s, be
+
+def _join(text: str, spans: List[Span]) -> str:
+    """Span texts joined by single spaces (one slice when the buffer already has exactly that)."""
+    if all(text[e:s] == " " for (_, e), (s, _) in zip(spans, spans[1:])):
+        return text[spans[0][0]:spans[-1][1]]
+    return " ".join(text[s:e] for s, e in spans)
+
+def _tail_spans(text: str, spans: List[Span], n: int) -> List[Span]:
+    """
+    Spans of the last `n` sentences of the chunk " ".join(spans), as
+    _SENT_SPLIT.split would cut them, found by walking units backwards
+    instead of re-splitting the chunk string.
+    """
+    out: List[Span] = []
+    for i in range(len(spans) - 1, -1, -1):
+        s, e = spans[i]
+        cuts = list(_SENT_SPLIT.finditer(text, s, e))
+        for m in reversed(cuts):
+            out.append((m.end(), e))
+            n -= 1
+            if n == 0:
+                return out[::-1]
+            e = m.start()
+        out.append((s, e))
+        # The " " joining the previous unit is a sentence boundary too
+        if i > 0 and text[spans[i - 1][1] - 1] in _SENT_END and text[s] in _SENT_START:
+            n -= 1
+            if n == 0:
+                return out[::-1]
+    return out[::-1]
+
+def iter_chunks(text: str, chunk_size: int = 900, overlap_sentences: int = 1) -> Iterator[str]:
+    """
+    Lazy version of chunk(): one normalized buffer, units and chunks kept as
+    (start, end) offsets, strings sliced only when a chunk is emitted.
+    Output is identical to chunk().
+    """
+    text = _normalize_whitespace(text)
+    prev: List[Span] | None = None
+
+    def emit(spans: List[Span]) -> str:
+        nonlocal prev
+        out = _join(text, spans)
+        if overlap_sentences > 0 and prev is not None:
+            # Overlap: last N sentences of the previous (un-overlapped) chunk
+            out = _join(text, _tail_spans(text, prev, overlap_sentences)) + " " + out
+        prev = spans
+        return out
+
+    current: List[Span] = []
+    current_len = 0
+    for s, e in _unit_spans(text):
+        u_len = e - s
+        # If one unit is huge, hard-split it
+        if u_len > chunk_size:
+            if current:
+                yield emit(current)
+                current, current_len = [], 0
+            for i in range(s, e, chunk_size):
+                ps, pe = _strip_span(text, i, min(i + chunk_size, e))
+                if ps < pe:
+                    yield emit([(ps, pe)])
+            continue
+
+        # If it fits, add to current chunk; else flush and start a new one
+        if current_len + u_len + (1 if current else 0) <= chunk_size:
+            current_len += u_len + (1 if current else 0)
+            current.append((s, e))
         else:
-            # Fallback: sentence split
-            sents = _SENT_SPLIT.split(b)
-            sents = [s.strip() for s in sents if s and s.strip()]
-            units.extend(sents)
+            yield emit(current)
+            current, current_len = [(s, e)], u_len
 
-    return units
+    if current:
+        yield emit(current)
 
 def chunk(text: str, chunk_size: int = 900, overlap_sentences: int = 1) -> List[str]:
     """
@@ -73,61 +175,4 @@ def chunk(text: str, chunk_size: int = 900, overlap_sentences: int = 1) -> List[
     - Reduces repetition compared to heavy char overlap
     - Produces chunks that are easier to cite and compare
     """
-    units = _split_into_units(text)
-    if not units:
-        return []
-
-    chunks: List[str] = []
-    current: List[str] = []
-    current_len = 0
-
-    def flush():
-        nonlocal current, current_len
-        if current:
-            chunks.append(" ".join(current).strip())
-        current = []
-        current_len = 0
-
-    for u in units:
-        u_len = len(u)
-        # If one unit is huge, hard-split it
-        if u_len > chunk_size:
-            flush()
-            for i in range(0, u_len, chunk_size):
-                part = u[i:i + chunk_size].strip()
-                if part:
-                    chunks.append(part)
-            continue
-
-        # If it fits, add to current chunk
-        if current_len + u_len + (1 if current else 0) <= chunk_size:
-            current.append(u)
-            current_len += u_len + (1 if current_len > 0 else 0)
-        else:
-            # flush current chunk
-            flush()
-            # start new chunk with this unit
-            current.append(u)
-            current_len = u_len
-
-    flush()
-
-    # Optional overlap: add last N units from previous chunk into next chunk
-    if overlap_sentences > 0 and len(chunks) > 1:
-        overlapped: List[str] = []
-        prev_units: List[str] = []
-
-        # Rebuild using units again to apply overlap cleanly.
-        # We'll do a simpler approach: overlap by tail text of previous chunk split by SENT_SPLIT.
-        # (Good enough for now; keeps code simple.)
-        overlapped.append(chunks[0])
-        for i in range(1, len(chunks)):
-            tail_units = _SENT_SPLIT.split(chunks[i - 1])
-            tail_units = [t.strip() for t in tail_units if t.strip()]
-            tail = " ".join(tail_units[-overlap_sentences:]) if tail_units else ""
-            combined = (tail + " " + chunks[i]).strip() if tail else chunks[i]
-            overlapped.append(combined)
-
-        return overlapped
-
-    return chunks
+    return list(iter_chunks(text, chunk_size=chunk_size, overlap_sentences=overlap_sentences))
@@ -0,0 +1,205 @@
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import re
+
+# Hierarchy markers in FIA regulations:
+#   level 0: article heading      "ARTICLE 48: SAFETY CAR"
+#   level 1: sub-article          "48.12 Should a car ..."  (deeper: 48.12.3)
+#   level 2: clause               "a) ...", "(b) ...", "(iv) ..."
+# Boundaries follow chunking.sentence_aware: markers must start the text or
+# follow whitespace; sentence ends as in _SENT_SPLIT.
+_BOUNDARY = re.compile(
+    r"(?P<article>\bARTICLE\s+(?P<art_no>\d{1,3})\b)"
+    r"|(?:(?<=\s)|^)(?P<sub>\d{1,3}(?:\.\d{1,3}){1,3})(?=\s+[A-Z(\"'])"
+    r"|(?:(?<=\s)|^)(?P<clause>\(?(?:[a-z]|[ivx]{2,4})\))(?=\s)"
+    r"|(?<=[.!?])\s+(?P<sent>)(?=[A-Z0-9\"'(])"
+)
+
+_WS = re.compile(r"[ \t]+")
+
+
+class _Unit(NamedTuple):
+    start: int            # document offsets
+    end: int
+    path: Tuple[str, ...]  # article path after this unit's marker
+    article: Optional[str]  # deepest numbered article in `path`
+    level: int            # 0 article, 1 sub-article, 2 clause, 3 sentence / continuation
+
+
+def _advance_path(path: Tuple[str, ...], m: "re.Match") -> Tuple[Tuple[str, ...], int]:
+    if m.group("article"):
+        return (m.group("art_no"),), 0
+    if m.group("sub"):
+        sub = m.group("sub")
+        return (sub.split(".", 1)[0], sub), 1
+    if m.group("clause"):
+        numbered = tuple(p for p in path if p[0].isdigit())
+        return numbered + (m.group("clause"),), 2
+    return path, 3
+
+
+def _article_of(path: Tuple[str, ...]) -> Optional[str]:
+    numbered = [p for p in path if p[0].isdigit()]
+    return numbered[-1] if numbered else None
+
+
+def _iter_units(pages: Iterable[Dict], page_starts: List[int], page_numbers: List[int], buf: List[str]) -> Iterator[_Unit]:
+    """
+    Stream units over the whole document. Page texts are appended to `buf`
+    (joined by "\\n") and page offsets recorded, so a sentence or article that
+    runs across a page break stays one unit / one article.
+    """
+    offset = 0
+    path: Tuple[str, ...] = ()
+    pending: Optional[_Unit] = None  # last unit of the previous page (may continue)
+
+    for p in pages:
+        text = _WS.sub(" ", p["text"].replace("\r\n", "\n")).strip()
+        if not text:
+            continue
+        page_starts.append(offset)
+        page_numbers.append(p["page"])
+        buf.append(text + "\n")
+
+        marks = list(_BOUNDARY.finditer(text))
+        cuts: List[Tuple[int, Optional["re.Match"]]] = []
+        if not marks or marks[0].start() > 0:
+            cuts.append((0, None))
+        for m in marks:
+            cut = m.start("sent") if m.group("sent") is not None else m.start()
+            if cuts and cuts[-1][0] == cut:
+                cuts[-1] = (cut, m)
+            else:
+                cuts.append((cut, m))
+
+        for i, (cut, m) in enumerate(cuts):
+            end = cuts[i + 1][0] if i + 1 < len(cuts) else len(text)
+            if m is None:
+                # No marker at the top of the page: mid-sentence text continues the
+                # previous page's last unit, anything else continues its article.
+                if pending is not None and not text[cut:cut + 1].isupper():
+                    pending = pending._replace(end=offset + end)
+                    continue
+                level = 3
+            else:
+                path, level = _advance_path(path, m)
+            if pending is not None:
+                yield pending
+            pending = _Unit(offset + cut, offset + end, path, _article_of(path), level)
+
+        offset += len(text) + 1
+
+    if pending is not None:
+        yield pending
+
+
+def chunk_document(
+    pages: Iterable[Dict],
+    chunk_size: int = 900,
+    overlap_units: int = 1,
+) -> Iterator[Dict]:
+    """
+    Structure-aware chunking over a whole document (pages streamed in order).
+
+    Strategy:
+    - Split into units at article / sub-article / clause markers and sentence ends
+    - Pack units up to chunk_size characters; a new ARTICLE always starts a new chunk
+    - Overlap: the next chunk re-starts at the last `overlap_units` units of the
+      previous one (same article only), by offset, never by re-splitting text
+
+    Yields {"text", "start", "end", "page", "page_end", "article_path", "articles"}
+    with document character offsets and the article path at the chunk start
+    ("48 > 48.12 > a)").
+    """
+    page_starts: List[int] = []
+    page_numbers: List[int] = []
+    parts: List[str] = []
+    doc = ""        # text from doc_off on; only what current/overlap units still need
+    doc_off = 0
+
+    current: List[_Unit] = []
+    current_len = 0
+    fresh = False  # current holds units not yet emitted (beyond the overlap carry)
+
+    def page_at(pos: int) -> int:
+        return page_numbers[max(0, bisect_right(page_starts, pos) - 1)]
+
+    def emit(units: List[_Unit]) -> Optional[Dict]:
+        start, end = units[0].start, units[-1].end
+        text = doc[start - doc_off:end - doc_off].strip()
+        if not text:
+            return None
+        articles: List[str] = []
+        for u in units:
+            if u.article and u.article not in articles:
+                articles.append(u.article)
+        return {
+            "text": text,
+            "start": start,
+            "end": end,
+            "page": page_at(start),
+            "page_end": page_at(max(start, end - 1)),
+            "article_path": " > ".join(units[0].path),
+            "articles": articles,
+        }
+
+    def flush(carry: bool) -> Optional[Dict]:
+        nonlocal current, current_len, fresh
+        out = emit(current) if current and fresh else None
+        if carry and overlap_units > 0 and current:
+            current = current[-overlap_units:]
+            current_len = sum(u.end - u.start for u in current)
+        else:
+            current, current_len = [], 0
+        fresh = False
+        return out
+
+    for u in _iter_units(pages, page_starts, page_numbers, parts):
+        if parts:
+            doc += "".join(parts)
+            parts.clear()
+        u_len = u.end - u.start
+
+        if u.level == 0 and current:
+            out = flush(carry=False)
+            if out:
+                yield out
+
+        # One huge unit: hard-split it by offsets
+        if u_len > chunk_size:
+            out = flush(carry=False)
+            if out:
+                yield out
+            for s in range(u.start, u.end, chunk_size):
+                piece = emit([u._replace(start=s, end=min(s + chunk_size, u.end))])
+                if piece:
+                    yield piece
+            continue
+
+        if current and current_len + u_len + 1 > chunk_size:
+            out = flush(carry=True)
+            if out:
+                yield out
+            # Carried overlap must leave room for the new unit
+            if current and current_len + u_len + 1 > chunk_size:
+                current, current_len = [], 0
+
+        current.append(u)
+        current_len += u_len + (1 if len(current) > 1 else 0)
+        fresh = True
+
+        # Drop text no unit can reference any more
+        keep_from = current[0].start
+        if keep_from - doc_off > 1 << 16:
+            doc = doc[keep_from - doc_off:]
+            doc_off = keep_from
+
+    out = flush(carry=False)
+    if out:
+        yield out
+
+
+def chunk(text: str, chunk_size: int = 900, overlap_units: int = 1) -> List[str]:
+    """Single-text convenience wrapper (same interface as the other chunkers)."""
+    pages = [{"page": 1, "text": text}]
+    return [c["text"] for c in chunk_document(pages, chunk_size=chunk_size, overlap_units=overlap_units)]
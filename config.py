@@ -14,6 +14,13 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 GEN_MODEL = os.getenv("GEN_MODEL", "gpt-4.1-mini")
 
+# Offline stand-ins (benchmarks / CI without API access)
+# Embeddings: "openai" (EMBEDDING_MODEL) or "local" (deterministic feature hashing, LOCAL_EMBED_DIM dims)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+LOCAL_EMBED_DIM = int(os.getenv("LOCAL_EMBED_DIM", "384"))
+# Generation + LLM reranking: "openai" or "fake" (deterministic extractive answers / overlap scores)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+
 # Dataset name (useful for future multi-dataset projects)
 DATASET_NAME = os.getenv("DATASET_NAME", "fia")
 
@@ -24,24 +31,130 @@ HF_MIN_LINE_LEN = int(os.getenv("HF_MIN_LINE_LEN", "8"))
 HF_MAX_LINE_LEN = int(os.getenv("HF_MAX_LINE_LEN", "180"))
 HF_MAX_REMOVE_PER_PAGE = int(os.getenv("HF_MAX_REMOVE_PER_PAGE", "6"))  # safety cap
 
+# PDF parsing: worker processes (0 = one per CPU, 1 = serial)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))
+# Extracted page text, stored per file hash so re-chunking / HF tuning skip pypdf
+PAGE_TEXT_CACHE_ENABLED = os.getenv("PAGE_TEXT_CACHE_ENABLED", "1") == "1"
+PAGE_TEXT_CACHE_DIR = os.getenv("PAGE_TEXT_CACHE_DIR", "./page_text_cache")
+
 # Chunking
-CHUNKER = os.getenv("CHUNKER", "sentence")  # "sentence" or "overlap"
+CHUNKER = os.getenv("CHUNKER", "sentence")  # "sentence", "structured" (article-aware, whole document) or "overlap"
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "900"))
 OVERLAP = int(os.getenv("OVERLAP", "100"))  # for overlap chunker (chars)
-OVERLAP_SENTENCES = int(os.getenv("OVERLAP_SENTENCES", "1"))  # for sentence chunker (units)
+OVERLAP_SENTENCES = int(os.getenv("OVERLAP_SENTENCES", "1"))  # for sentence / structured chunkers (units)
 
 # Chroma
 CHROMA_DIR = os.getenv("CHROMA_DIR", "./chroma_db")
 
 # If user didn't set collection explicitly, choose based on dataset + chunker
-_default_collection = os.getenv("CHROMA_COLLECTION", f"{DATASET_NAME}_{CHUNKER}")
+# (local embeddings get their own collection, so they never mix with OpenAI vectors)
+_default_collection = os.getenv(
+    "CHROMA_COLLECTION",
+    f"{DATASET_NAME}_{CHUNKER}" + ("" if EMBEDDING_BACKEND == "openai" else f"_{EMBEDDING_BACKEND}"),
+)
 CHROMA_COLLECTION = _default_collection
 
+# Partitioning: one physical collection per season (optionally per regulation_type).
+# "" = single collection, "season", or "season,regulation_type"
+PARTITION_BY = [f.strip() for f in os.getenv("PARTITION_BY", "").split(",") if f.strip()]
+
+# Vector store backend: "chroma" (default) or "faiss" (in-process, memory-mapped)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+FAISS_DIR = os.getenv("FAISS_DIR", "./faiss_db")
+FAISS_INDEX = os.getenv("FAISS_INDEX", "flat")  # "flat" or "hnsw"
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+FAISS_BRUTE_FORCE_MAX_ROWS = int(os.getenv("FAISS_BRUTE_FORCE_MAX_ROWS", "4096"))  # exact scan below this
+# Compressed FAISS index: "none" (float32), "fp16", "sq8" (int8 scalar) or "pq" (product quantized).
+# Full-precision vectors stay in the memory-mapped vectors.f32 and rescore the top candidates.
+FAISS_QUANT = os.getenv("FAISS_QUANT", "none")
+FAISS_QUANT_DIM = int(os.getenv("FAISS_QUANT_DIM", "0"))  # Matryoshka truncation of indexed vectors (0 = full dim)
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "64"))  # PQ bytes per vector; must divide the indexed dim
+FAISS_RESCORE_FACTOR = int(os.getenv("FAISS_RESCORE_FACTOR", "4"))  # rescore k * factor candidates (0 = off)
+# Metadata fields with a bitmap index in the FAISS store (filters on them skip row-by-row checks)
+METADATA_INDEX_FIELDS = [
+    f.strip()
+    for f in os.getenv("METADATA_INDEX_FIELDS", "doc_type,season,regulation_type,issue").split(",")
+    if f.strip()
+]
+
 # Reranking
 RERANK_ENABLED = os.getenv("RERANK_ENABLED", "1") == "1"
 RECALL_K = int(os.getenv("RECALL_K", "40"))          # how many to fetch from vector db
 RERANK_MODEL = os.getenv("RERANK_MODEL", "gpt-4.1-mini")
 RERANK_MAX_CHARS = int(os.getenv("RERANK_MAX_CHARS", "900"))  # per chunk snippet
+RERANK_SHARD_SIZE = int(os.getenv("RERANK_SHARD_SIZE", "10"))  # candidates per LLM call
+RERANK_CONCURRENCY = int(os.getenv("RERANK_CONCURRENCY", "4"))  # shards scored in parallel
+RERANK_MAX_RETRIES = int(os.getenv("RERANK_MAX_RETRIES", "1"))  # retries per failed shard
 
 # Retrieval
+# "vector" (embeddings only), "hybrid" (BM25 + vector, fused) or "lexical" (BM25 only, no embedding call)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "1") == "1"  # build BM25 index at ingestion
+LEXICAL_DIR = os.getenv("LEXICAL_DIR", "./lexical_db")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
 TOP_K = int(os.getenv("TOP_K", "6"))
+
+# Embedding cache (on-disk, keyed by EMBEDDING_MODEL + normalized text hash)
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "1") == "1"
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "./embed_cache")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))  # LRU cap
+# index.json is rewritten after this many new vectors or seconds (and at exit)
+EMBED_CACHE_FLUSH_EVERY = int(os.getenv("EMBED_CACHE_FLUSH_EVERY", "4096"))
+EMBED_CACHE_FLUSH_SECONDS = float(os.getenv("EMBED_CACHE_FLUSH_SECONDS", "30"))
+
+# Incremental indexing (per-PDF manifest: file hash, chunker settings, chunk ids)
+INDEX_MANIFEST_PATH = os.getenv(
+    "INDEX_MANIFEST_PATH",
+    os.path.join(CHROMA_DIR, f"{CHROMA_COLLECTION}_manifest.json"),
+)
+
+# Streaming ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))  # max chunks per embed/upsert call
+INGEST_BATCH_TOKENS = int(os.getenv("INGEST_BATCH_TOKENS", "40000"))  # est. token budget per embed call
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))   # batches buffered ahead of embedding
+
+# Embedding scheduler (ingestion)
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))  # embedding requests in flight
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))  # retries on 429
+EMBED_BACKOFF_BASE = float(os.getenv("EMBED_BACKOFF_BASE", "1.0"))  # seconds
+EMBED_BACKOFF_MAX = float(os.getenv("EMBED_BACKOFF_MAX", "60"))  # seconds
+
+# Retrieval fan-out (answer_async): max concurrent vector queries
+RETRIEVAL_CONCURRENCY = int(os.getenv("RETRIEVAL_CONCURRENCY", "8"))
+
+# Candidate fusion (reciprocal-rank fusion over per-rewrite rankings, before rerank)
+FUSION_RRF_K = int(os.getenv("FUSION_RRF_K", "60"))
+FUSION_MAX_CANDIDATES = int(os.getenv("FUSION_MAX_CANDIDATES", "40"))  # sent to reranker
+
+# Reranker backend: "llm" (RERANK_MODEL prompt) or "cross_encoder" (local CPU model)
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "llm")
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+CROSS_ENCODER_BATCH_SIZE = int(os.getenv("CROSS_ENCODER_BATCH_SIZE", "32"))
+
+# Answer cache (in-process): exact (query + plan) and semantic (query-embedding similarity)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256"))
+ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", "3600"))
+ANSWER_CACHE_SIM_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIM_THRESHOLD", "0.95"))  # cosine
+
+# Rerank score cache (persistent, keyed by normalized query + chunk id + reranker model)
+RERANK_CACHE_ENABLED = os.getenv("RERANK_CACHE_ENABLED", "1") == "1"
+RERANK_CACHE_PATH = os.getenv("RERANK_CACHE_PATH", "./rerank_cache.sqlite")
+RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "100000"))  # LRU cap
+
+# Direct article/clause lookup ("Article 48.12" -> chunk ids, no recall/rerank)
+ARTICLE_LOOKUP_ENABLED = os.getenv("ARTICLE_LOOKUP_ENABLED", "1") == "1"
+ARTICLE_INDEX_PATH = os.getenv(
+    "ARTICLE_INDEX_PATH",
+    os.path.join(CHROMA_DIR, f"{CHROMA_COLLECTION}_articles.json"),
+)
+ARTICLE_LOOKUP_MAX_CHUNKS = int(os.getenv("ARTICLE_LOOKUP_MAX_CHUNKS", "12"))
+
+# Tracing: per-stage spans for answer / search / rerank / build_index (durations,
+# counts, token usage, cache hits). Disabled = a no-op context manager per stage.
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "0") == "1"
+TRACE_EXPORT = [e.strip() for e in os.getenv("TRACE_EXPORT", "jsonl").split(",") if e.strip()]  # "jsonl", "prometheus"
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "./traces.jsonl")
+TRACE_PROM_PATH = os.getenv("TRACE_PROM_PATH", "./metrics.prom")  # node_exporter textfile format
@@ -0,0 +1,236 @@
+# embeddings/cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace-normalize text so trivially different strings share a key."""
+    return _WS.sub(" ", text or "").strip()
+
+
+def text_key(text: str) -> str:
+    """Content address of a text (sha256 of its normalized form)."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _safe_dirname(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed embedding cache for one embedding model.
+
+    Layout (one folder per model, so the effective key is (model, sha)):
+      - vectors.f32 : memory-mapped float32 matrix, one row per cached text
+      - keys.bin    : memory-mapped 32-byte key digest per row (which text the row holds)
+      - index.json  : dim, capacity and [key, row] pairs in LRU order (oldest first)
+
+    When `max_entries` is reached, the least recently used entry is evicted
+    and its row is reused for the new vector. index.json is only rewritten by
+    flush() (every `flush_every` new vectors / `flush_seconds`, see maybe_flush),
+    so it can map an evicted key to a reused row; reads check the row's digest,
+    which makes such a key a miss instead of returning another text's vector.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        model: str,
+        max_entries: int,
+        flush_every: int = 4096,
+        flush_seconds: float = 30.0,
+    ):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive.")
+
+        self.dir = Path(root) / _safe_dirname(model)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.model = model
+        self.max_entries = max_entries
+
+        self._vec_path = self.dir / "vectors.f32"
+        self._key_path = self.dir / "keys.bin"
+        self._idx_path = self.dir / "index.json"
+        self._lock = threading.Lock()
+
+        self.dim: Optional[int] = None
+        self.capacity = 0
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = []
+        self._mm: Optional[np.memmap] = None
+        self._keys: Optional[np.memmap] = None  # (capacity, 32) uint8
+        self._dirty = False
+        self.flush_every = max(1, flush_every)
+        self.flush_seconds = flush_seconds
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _load(self):
+        if not self._idx_path.exists():
+            return
+        data = json.loads(self._idx_path.read_text(encoding="utf-8"))
+        self.dim = data.get("dim")
+        self.capacity = int(data.get("capacity", 0))
+        for key, row in data.get("entries", []):
+            self._rows[key] = int(row)
+
+        if self.dim and self.capacity and self._vec_path.exists() and self._key_path.exists():
+            self._mm = np.memmap(
+                self._vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim)
+            )
+            self._keys = np.memmap(self._key_path, dtype=np.uint8, mode="r+", shape=(self.capacity, 32))
+            # Rows reused after the last flush no longer hold the indexed text
+            for key, row in list(self._rows.items()):
+                if bytes(self._keys[row]) != bytes.fromhex(key):
+                    del self._rows[key]
+            used = set(self._rows.values())
+            self._free = [r for r in range(self.capacity) if r not in used]
+        else:
+            # Index without matrix / key digests (deleted by hand, older layout): start fresh
+            self._rows.clear()
+            self.capacity = 0
+            self.dim = None
+
+        # Cap may have been lowered since the last run
+        while len(self._rows) > self.max_entries:
+            _, row = self._rows.popitem(last=False)
+            self._free.append(row)
+
+    def flush(self):
+        """Write the matrix first, then the index, so the index never points at unwritten rows."""
+        with self._lock:
+            if not self._dirty:
+                return
+            if self._mm is not None:
+                self._mm.flush()
+                self._keys.flush()
+            data = {
+                "model": self.model,
+                "dim": self.dim,
+                "capacity": self.capacity,
+                "entries": [[k, r] for k, r in self._rows.items()],
+            }
+            tmp = self._idx_path.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, self._idx_path)
+            self._dirty = False
+            self._unflushed = 0
+            self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        """flush() once enough new vectors or time have accumulated."""
+        if self._unflushed >= self.flush_every or (
+            self._dirty and time.monotonic() - self._last_flush >= self.flush_seconds
+        ):
+            self.flush()
+
+    def _grow(self, needed: int):
+        """Extend the memory-mapped matrix so at least `needed` rows exist."""
+        new_cap = min(max(needed, self.capacity * 2, 1024), self.max_entries)
+        if new_cap <= self.capacity:
+            return
+
+        if self._mm is not None:
+            self._mm.flush()
+            self._keys.flush()
+            self._mm = self._keys = None
+
+        with open(self._vec_path, "ab") as f:
+            f.truncate(new_cap * self.dim * 4)
+        with open(self._key_path, "ab") as f:
+            f.truncate(new_cap * 32)
+
+        self._free.extend(range(self.capacity, new_cap))
+        self.capacity = new_cap
+        self._mm = np.memmap(
+            self._vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim)
+        )
+        self._keys = np.memmap(self._key_path, dtype=np.uint8, mode="r+", shape=(self.capacity, 32))
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Return cached vectors (or None for misses), refreshing LRU order on hits.
+        Hits don't mark the cache dirty: the order is persisted with the next write.
+        """
+        out: List[Optional[List[float]]] = []
+        with self._lock:
+            for t in texts:
+                key = text_key(t)
+                row = self._rows.get(key)
+                if row is None or self._mm is None or bytes(self._keys[row]) != bytes.fromhex(key):
+                    out.append(None)
+                    self.misses += 1
+                    continue
+                self._rows.move_to_end(key)
+                out.append(self._mm[row].tolist())
+                self.hits += 1
+        return out
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        if len(texts) != len(vectors):
+            raise ValueError(f"Length mismatch: texts={len(texts)} vectors={len(vectors)}")
+
+        with self._lock:
+            for t, v in zip(texts, vectors):
+                vec = np.asarray(v, dtype=np.float32)
+                if self.dim is None:
+                    self.dim = int(vec.shape[0])
+                if vec.shape[0] != self.dim:
+                    raise ValueError(f"Embedding dim changed: cache={self.dim} got={vec.shape[0]}")
+
+                key = text_key(t)
+                row = self._rows.get(key)
+                if row is None:
+                    if not self._free:
+                        if self.capacity < self.max_entries:
+                            self._grow(self.capacity + 1)
+                        else:
+                            # LRU eviction: reuse the oldest row
+                            _, evicted = self._rows.popitem(last=False)
+                            self._free.append(evicted)
+                    row = self._free.pop()
+                # Digest cleared while the row is rewritten, so it never vouches for a torn row
+                self._keys[row] = 0
+                self._mm[row] = vec
+                self._keys[row] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+                self._rows[key] = row
+                self._rows.move_to_end(key)
+            self._unflushed += len(texts)
+            self._dirty = True
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model,
+            "entries": len(self._rows),
+            "capacity": self.capacity,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
@@ -1,23 +1,104 @@
 # embeddings/embedder.py
-from openai import OpenAI
-from config import OPENAI_API_KEY, EMBEDDING_MODEL
+from __future__ import annotations
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+import atexit
+from typing import List, Optional
 
-def embed_texts(texts: list[str]) -> list[list[float]]:
-    """
-    Embed a batch of texts with OpenAI embeddings.
-    """
+from config import (
+    OPENAI_API_KEY,
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBED_CACHE_ENABLED,
+    EMBED_CACHE_DIR,
+    EMBED_CACHE_MAX_ENTRIES,
+    EMBED_CACHE_FLUSH_EVERY,
+    EMBED_CACHE_FLUSH_SECONDS,
+)
+from embeddings.cache import EmbeddingCache, text_key
+import tracing
+
+if EMBEDDING_BACKEND == "openai":
+    from openai import OpenAI
+    client = OpenAI(api_key=OPENAI_API_KEY)
+    MODEL_ID = EMBEDDING_MODEL
+elif EMBEDDING_BACKEND == "local":
+    from embeddings.local import MODEL_ID, embed_local
+    client = None
+else:
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {EMBEDDING_BACKEND!r} (use 'openai' or 'local')")
+
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_cache() -> Optional[EmbeddingCache]:
+    """Lazily open the on-disk embedding cache (None when disabled)."""
+    global _cache
+    if not EMBED_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = EmbeddingCache(
+            root=EMBED_CACHE_DIR,
+            model=MODEL_ID,
+            max_entries=EMBED_CACHE_MAX_ENTRIES,
+            flush_every=EMBED_CACHE_FLUSH_EVERY,
+            flush_seconds=EMBED_CACHE_FLUSH_SECONDS,
+        )
+        atexit.register(_cache.flush)
+    return _cache
+
+
+def _embed_uncached(texts: list[str]) -> list[list[float]]:
+    tracing.current().add("upstream", len(texts))
+    if client is None:
+        return embed_local(texts)
     resp = client.embeddings.create(
         model=EMBEDDING_MODEL,
         input=texts,
     )
+    tracing.add_usage(resp)
     return [item.embedding for item in resp.data]
 
-def embed_query(text: str) -> list[float]:
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=text,
-    )
-    return resp.data[0].embedding
 
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    """
+    Embed a batch of texts with OpenAI embeddings (or the local stand-in,
+    EMBEDDING_BACKEND="local").
+
+    With the cache enabled, only texts not already cached (by model + normalized
+    text hash) are sent upstream, de-duplicated within the batch.
+    """
+    if not texts:
+        return []
+
+    with tracing.span("embed", texts=len(texts), model=MODEL_ID) as sp:
+        cache = get_cache()
+        if cache is None:
+            return _embed_uncached(texts)
+
+        vectors: List[Optional[list[float]]] = cache.get_many(texts)
+
+        # Unique misses only (same normalized text -> one upstream input)
+        miss_by_key: dict[str, str] = {}
+        for t, v in zip(texts, vectors):
+            if v is None:
+                miss_by_key.setdefault(text_key(t), t)
+        sp.set(cache_hits=sum(v is not None for v in vectors))
+
+        if miss_by_key:
+            miss_texts = list(miss_by_key.values())
+            fresh = _embed_uncached(miss_texts)
+            cache.put_many(miss_texts, fresh)
+            # index.json is rewritten per EMBED_CACHE_FLUSH_EVERY vectors / _SECONDS, not per call
+            cache.maybe_flush()
+
+            fresh_by_key = {k: e for k, e in zip(miss_by_key.keys(), fresh)}
+            vectors = [
+                v if v is not None else fresh_by_key[text_key(t)]
+                for t, v in zip(texts, vectors)
+            ]
+
+        return vectors
+
+
+def embed_query(text: str) -> list[float]:
+    return embed_texts([text])[0]
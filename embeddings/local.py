@@ -0,0 +1,41 @@
+# embeddings/local.py
+from __future__ import annotations
+
+import hashlib
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+from config import LOCAL_EMBED_DIM
+from index.lexical import tokenize
+
+MODEL_ID = f"local-hash-{LOCAL_EMBED_DIM}"  # also the manifest's embedding_model
+
+
+@lru_cache(maxsize=1 << 18)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    """Stable (index, sign) for a feature; blake2b, not hash(), so it survives restarts."""
+    h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dim, (1.0 if h >> 63 else -1.0)
+
+
+def embed_local(texts: List[str], dim: int = LOCAL_EMBED_DIM) -> List[List[float]]:
+    """
+    Deterministic offline embeddings: signed feature hashing of unigrams and
+    bigrams (same tokens as the BM25 index), sublinear counts, unit-normalized.
+
+    No model and no network; good enough that lexically related questions and
+    chunks land close together, so retrieval quality and latency can be
+    benchmarked without OpenAI. Empty texts embed to the zero vector.
+    """
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        tokens = tokenize(text)
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            j, sign = _bucket(feature, dim)
+            out[i, j] += sign
+    out = np.sign(out) * np.log1p(np.abs(out))
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    out /= np.where(norms == 0, 1.0, norms)
+    return out.tolist()
@@ -0,0 +1,62 @@
+import sys
+import time
+import tracemalloc
+
+from config import CHUNK_SIZE, OVERLAP, OVERLAP_SENTENCES
+from chunking import fixed, overlap, sentence_aware, structured
+from index.pdf_loader import load_pdf_pages
+
+CHUNKERS = {
+    "fixed": lambda text: fixed.chunk(text, chunk_size=CHUNK_SIZE),
+    "overlap": lambda text: overlap.chunk(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP),
+    "sentence": lambda text: sentence_aware.chunk(text, chunk_size=CHUNK_SIZE, overlap_sentences=OVERLAP_SENTENCES),
+    "structured": lambda text: structured.chunk(text, chunk_size=CHUNK_SIZE, overlap_units=OVERLAP_SENTENCES),
+}
+
+
+def bench(chunk_fn, texts: list[str], repeats: int) -> dict:
+    """Throughput over `repeats` passes, then peak traced allocation of one pass."""
+    n_chunks = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for t in texts:
+            n_chunks += len(chunk_fn(t))
+    seconds = time.perf_counter() - start
+
+    # Separate pass: tracemalloc slows allocation-heavy code down a lot
+    tracemalloc.start()
+    for t in texts:
+        chunk_fn(t)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n_chars = sum(len(t) for t in texts) * repeats
+    return {
+        "chunks_per_s": n_chunks / seconds if seconds else 0.0,
+        "mb_per_s": n_chars / seconds / 1e6 if seconds else 0.0,
+        "chunks_per_pass": n_chunks // repeats,
+        "peak_kib": peak / 1024,
+    }
+
+
+def main(pdf_dir: str, repeats: int, names: list[str]):
+    pages = load_pdf_pages(pdf_dir)
+    texts = [p["text"] for p in pages if p["text"].strip()]
+    print(f"📄 {len(texts)} pages, {sum(len(t) for t in texts) / 1e6:.2f}M chars | "
+          f"chunk_size={CHUNK_SIZE} overlap={OVERLAP} overlap_sentences={OVERLAP_SENTENCES} | x{repeats}")
+
+    print("\n=== SUMMARY ===")
+    for name in names:
+        s = bench(CHUNKERS[name], texts, repeats)
+        print(
+            f"{name:>10}: {s['chunks_per_s']:>10.0f} chunks/s  {s['mb_per_s']:6.1f} MB/s  "
+            f"chunks={s['chunks_per_pass']}  peak={s['peak_kib']:.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    # Usage: python -m evaluation.bench_chunking [pdf_dir] [repeats] [fixed overlap sentence structured]
+    args = sys.argv[1:]
+    pdf_dir = args[0] if args else "./data/pdfs"
+    repeats = int(args[1]) if len(args) > 1 else 5
+    main(pdf_dir, repeats, args[2:] or list(CHUNKERS))
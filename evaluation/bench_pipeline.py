@@ -0,0 +1,136 @@
+import functools
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+# Caches would turn repeats into cache hits; set these explicitly to benchmark them
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "0")
+os.environ.setdefault("RERANK_CACHE_ENABLED", "0")
+
+from config import (
+    TOP_K,
+    EMBEDDING_BACKEND,
+    LLM_BACKEND,
+    RETRIEVAL_MODE,
+    VECTOR_BACKEND,
+    RERANKER_BACKEND,
+    CHROMA_COLLECTION,
+)
+from index import search as search_mod
+from rag import rag_pipeline
+
+STAGES = ["rewrite", "embed", "vector_query", "lexical_query", "rerank", "generate"]
+_timings: dict[str, list[float]] = {s: [] for s in STAGES}
+
+
+def _timed(stage: str, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _timings[stage].append(time.perf_counter() - start)
+    return wrapper
+
+
+def instrument():
+    """Wrap the pipeline's stage entry points (as the pipeline looks them up) with timers."""
+    rag_pipeline.rewrite_query = _timed("rewrite", rag_pipeline.rewrite_query)
+    rag_pipeline.embed_query = _timed("embed", rag_pipeline.embed_query)
+    search_mod.embed_query = _timed("embed", search_mod.embed_query)
+    search_mod.embed_texts = _timed("embed", search_mod.embed_texts)
+    search_mod.store_query = _timed("vector_query", search_mod.store_query)
+    search_mod.store_query_many = _timed("vector_query", search_mod.store_query_many)
+    search_mod.lexical_search_many = _timed("lexical_query", search_mod.lexical_search_many)
+    rag_pipeline.rerank = _timed("rerank", rag_pipeline.rerank)
+    create = rag_pipeline.client.responses.create
+    rag_pipeline.client = SimpleNamespace(responses=SimpleNamespace(create=_timed("generate", create)))
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile (values need not be sorted)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+def reciprocal_rank(expected: str, hits: list[dict], k: int) -> float:
+    """1/rank of the first of the top-k chunks from the expected document (0 if none)."""
+    for rank, h in enumerate(hits[:k], start=1):
+        if h["meta"].get("source") == expected:
+            return 1.0 / rank
+    return 0.0
+
+
+def _quality_line(label: str, rrs: list[float], latencies: list[float], k: int) -> str:
+    n = len(rrs)
+    hit = sum(1 for rr in rrs if rr > 0) / n if n else 0.0
+    mrr = sum(rrs) / n if n else 0.0
+    return (
+        f"{label:>9}: Doc Hit@{k}={hit:.2%}  MRR@{k}={mrr:.3f}  "
+        f"p50={percentile(latencies, 50) * 1000:.1f}ms  p95={percentile(latencies, 95) * 1000:.1f}ms"
+    )
+
+
+def main(repeats: int, k: int, pdf_dir: str | None, gold_path: str = "evaluation/gold_rag_eval.json"):
+    if pdf_dir:
+        from index.build_index import build_index_from_pdfs
+        build_index_from_pdfs(pdf_dir)
+
+    gold = json.load(open(gold_path, "r", encoding="utf-8"))
+    gold = [g for g in gold if g.get("expected_doc")]
+    instrument()
+
+    # Retrieval only: index.search.search
+    search_rr, search_lat = [], []
+    for _ in range(repeats):
+        for g in gold:
+            start = time.perf_counter()
+            hits = search_mod.search(g["query"], k=k)
+            search_lat.append(time.perf_counter() - start)
+            search_rr.append(reciprocal_rank(g["expected_doc"], hits, k))
+
+    # End to end: rag.rag_pipeline.answer (stage timings from these runs only)
+    for times in _timings.values():
+        times.clear()
+    answer_rr, answer_lat = [], []
+    for _ in range(repeats):
+        for g in gold:
+            start = time.perf_counter()
+            _, hits = rag_pipeline.answer(g["query"])
+            answer_lat.append(time.perf_counter() - start)
+            answer_rr.append(reciprocal_rank(g["expected_doc"], hits, TOP_K))
+
+    print("\n=== SUMMARY ===")
+    print(
+        f"Queries: {len(gold)} x{repeats} | collection={CHROMA_COLLECTION} ({VECTOR_BACKEND}, {RETRIEVAL_MODE}) | "
+        f"embeddings={EMBEDDING_BACKEND} llm={LLM_BACKEND} reranker={RERANKER_BACKEND}"
+    )
+    print(_quality_line("search", search_rr, search_lat, k))
+    print(_quality_line("answer", answer_rr, answer_lat, TOP_K))
+
+    print("\n=== STAGES (answer) ===")
+    for stage in STAGES:
+        times = _timings[stage]
+        if not times:
+            continue
+        print(
+            f"{stage:>13}: calls={len(times):<5} p50={percentile(times, 50) * 1000:8.2f}ms  "
+            f"p95={percentile(times, 95) * 1000:8.2f}ms  p99={percentile(times, 99) * 1000:8.2f}ms  "
+            f"total={sum(times):.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    # Usage: python -m evaluation.bench_pipeline [repeats] [k] [pdf_dir to index first]
+    # Offline: EMBEDDING_BACKEND=local LLM_BACKEND=fake (indexes into "<dataset>_<chunker>_local")
+    args = sys.argv[1:]
+    main(
+        repeats=int(args[0]) if args else 3,
+        k=int(args[1]) if len(args) > 1 else TOP_K,
+        pdf_dir=args[2] if len(args) > 2 else None,
+    )
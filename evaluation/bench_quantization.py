@@ -0,0 +1,86 @@
+import sys
+import time
+
+import numpy as np
+
+from config import CHROMA_COLLECTION, FAISS_DIR, FAISS_INDEX, FAISS_PQ_M, FAISS_RESCORE_FACTOR, TOP_K
+from index.faiss_store import FaissStore
+
+# name -> (quant, quant_dim); "float32" is the current uncompressed path
+VARIANTS = {
+    "float32": ("none", 0),
+    "fp16": ("fp16", 0),
+    "sq8": ("sq8", 0),
+    "pq": ("pq", 0),
+    "sq8-d512": ("sq8", 512),
+    "pq-d512": ("pq", 512),
+}
+
+
+def exact_top_k(store: FaissStore, queries: np.ndarray, k: int) -> list[set[str]]:
+    """Ground truth: exact inner product over every live full-precision vector."""
+    rows = store.allowed_rows(None)
+    sims = queries @ store._mm[rows].T
+    top = np.argsort(-sims, axis=1)[:, :k]
+    return [{store.ids[r] for r in rows[t]} for t in top]
+
+
+def bench(name: str, quant: str, quant_dim: int, collection: str, queries: np.ndarray, truth: list[set[str]], k: int) -> dict:
+    store = FaissStore(FAISS_DIR, collection, quant=quant, quant_dim=quant_dim)
+    store.brute_force_max_rows = 0  # always go through the index
+
+    start = time.perf_counter()
+    nbytes = store.index_nbytes()
+    build_s = time.perf_counter() - start
+
+    latencies = []
+    recalls = []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = store.query_many([q.tolist()], k=k)[0]
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({h["id"] for h in hits} & expected) / len(expected))
+
+    latencies.sort()
+    return {
+        "recall": float(np.mean(recalls)),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "index_mb": nbytes / 1e6,
+        "build_s": build_s,
+    }
+
+
+def main(collection: str, n_queries: int, names: list[str]):
+    base = FaissStore(FAISS_DIR, collection, quant="none", quant_dim=0)
+    rows = base.allowed_rows(None)
+    if rows.size == 0:
+        print(f"❌ FAISS store {collection!r} is empty (build it with VECTOR_BACKEND=faiss)")
+        return
+
+    # Stored chunk vectors stand in for queries (offline, no embedding calls)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(rows, size=min(n_queries, rows.size), replace=False)
+    queries = np.asarray(base._mm[sample], dtype=np.float32)
+    k = min(TOP_K, int(rows.size))
+    truth = exact_top_k(base, queries, k)
+
+    print(f"📦 {collection}: {rows.size} rows, dim={base.dim} | {len(queries)} queries | k={k} | "
+          f"index={FAISS_INDEX} pq_m={FAISS_PQ_M} rescore x{FAISS_RESCORE_FACTOR}")
+    print("\n=== SUMMARY ===")
+    for name in names:
+        quant, quant_dim = VARIANTS[name]
+        s = bench(name, quant, quant_dim, collection, queries, truth, k)
+        print(
+            f"{name:>10}: recall@{k}={s['recall']:.3f}  p50={s['p50_ms']:.2f}ms  p95={s['p95_ms']:.2f}ms  "
+            f"index={s['index_mb']:.1f}MB  build={s['build_s']:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    # Usage: python -m evaluation.bench_quantization [collection] [n_queries] [float32 fp16 sq8 pq sq8-d512 pq-d512]
+    # Rescoring is controlled by FAISS_RESCORE_FACTOR (0 = raw compressed scores).
+    args = sys.argv[1:]
+    collection = args[0] if args else CHROMA_COLLECTION
+    n_queries = int(args[1]) if len(args) > 1 else 200
+    main(collection, n_queries, args[2:] or list(VARIANTS))
@@ -0,0 +1,65 @@
+import json
+import sys
+import time
+
+from config import RECALL_K, TOP_K, FUSION_RRF_K, FUSION_MAX_CANDIDATES
+from index.filters import build_plan
+from index.fusion import reciprocal_rank_fusion
+from index.search import search_many
+from rag.query_rewriter import rewrite_query
+from rag.reranker import RERANKERS
+
+
+def recall_candidates(query: str) -> list[dict]:
+    """Same wide recall the pipeline reranks: rewrites -> vector search -> RRF."""
+    plan = build_plan(query)
+    rankings = search_many(rewrite_query(query), k=RECALL_K, where=plan.where)
+    return reciprocal_rank_fusion(rankings, k=FUSION_RRF_K, limit=FUSION_MAX_CANDIDATES)
+
+
+def main(backends: list[str]):
+    gold = json.load(open("evaluation/gold_rag_eval.json", "r", encoding="utf-8"))
+    gold = [g for g in gold if g.get("expected_doc")]
+
+    # Recall once, so every backend reranks the exact same candidates
+    candidates = {g["id"]: recall_candidates(g["query"]) for g in gold}
+
+    summary = {}
+    for name in backends:
+        rerank_fn = RERANKERS[name]
+        latencies = []
+        hits_at_k = 0
+
+        for g in gold:
+            cands = candidates[g["id"]]
+
+            start = time.perf_counter()
+            ranked = rerank_fn(g["query"], cands, TOP_K)
+            latencies.append(time.perf_counter() - start)
+
+            sources = [h["meta"].get("source") for h in ranked]
+            ok = g["expected_doc"] in sources
+            hits_at_k += int(ok)
+
+            print(f"[{name}] {g['query']!r} -> {'✅ HIT' if ok else '❌ MISS'} ({latencies[-1]:.2f}s)")
+
+        latencies.sort()
+        summary[name] = {
+            "hit_at_k": hits_at_k / len(gold) if gold else 0.0,
+            "p50_s": latencies[len(latencies) // 2] if latencies else 0.0,
+            "max_s": latencies[-1] if latencies else 0.0,
+            "total_s": sum(latencies),
+        }
+
+    print("\n=== SUMMARY ===")
+    print(f"Queries: {len(gold)} | candidates <= {FUSION_MAX_CANDIDATES} | k={TOP_K}")
+    for name, s in summary.items():
+        print(
+            f"{name:>14}: Hit@{TOP_K}={s['hit_at_k']:.2%} "
+            f"p50={s['p50_s']:.3f}s max={s['max_s']:.3f}s total={s['total_s']:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    # Usage: python -m evaluation.bench_rerank [llm cross_encoder]
+    main(sys.argv[1:] or ["llm", "cross_encoder"])
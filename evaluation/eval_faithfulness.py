@@ -1,16 +1,24 @@
 import json
-from rag.rag_pipeline import run_rag
-from index.search import FaissRetriever
+import re
+from rag.rag_pipeline import answer
+from index.lexical import tokenize
 
-def normalize(s: str) -> str:
-    return " ".join(s.lower().split())
+_CITATION = re.compile(r"\[(\d+)\]")
+# Sentence ends; a trailing "[1]" stays with the sentence it cites
+_SENTENCE = re.compile(r"(?<=[.!?])\s+(?!\[\d)|(?<=\])\s+(?=[A-Z])")
 
-def main():
-    retriever = FaissRetriever(
-        index_path="index/chunk_index.faiss",
-        meta_path="index/chunk_metadata.json",
-    )
+# Share of a cited sentence's terms that must appear in the chunks it cites
+MIN_SUPPORT = 0.5
+
+def support(sentence: str, chunks: list[str]) -> float:
+    terms = set(tokenize(_CITATION.sub(" ", sentence)))
+    if not terms:
+        return 1.0
+    context = set(tokenize(" ".join(chunks)))
+    return len(terms & context) / len(terms)
 
+def main():
+    # Runs the full pipeline (VECTOR_BACKEND / RETRIEVAL_MODE from config)
     gold = json.load(open("evaluation/gold_rag_eval.json", "r", encoding="utf-8"))
 
     faith_ok = 0
@@ -19,49 +27,51 @@ def main():
     for g in gold:
         query = g["query"]
 
-        # Retrieve the exact context we expect the model to use
-        chunks = retriever.retrieve(query, top_k=5)
-
-        # Build one big context string for substring checks
-        context = "\n\n".join([f"[{c['doc_id']}|chunk={c['chunk_id']}]\n{c['text']}" for c in chunks])
-        context_norm = normalize(context)
-
-        out = run_rag(query, top_k=5)
+        # hits are exactly the chunks the model was given, numbered [1..n]
+        text, hits = answer(query)
         total += 1
 
         # If refusal, consider faithful (it didn't invent)
-        if out.answer.strip().lower() == "i don't know":
+        if text.strip().lower().startswith("i don't know"):
             faith_ok += 1
             print("\nQuery:", query)
             print("✅ Faithful (refused)")
             continue
 
         # Evidence checks:
-        # 1) must include at least 1 quote
-        # 2) every quote must be a substring of context
+        # 1) must cite at least one retrieved chunk
+        # 2) every cited sentence must be supported by the chunks it cites
+        evidence = []
         evidence_ok = True
-
-        if not getattr(out, "evidence", None) or len(out.evidence) == 0:
+        for sentence in _SENTENCE.split(text):
+            cited = [int(n) for n in _CITATION.findall(sentence)]
+            if not cited:
+                continue
+            if not all(1 <= n <= len(hits) for n in cited):
+                evidence_ok = False
+                evidence.append((sentence, 0.0))
+                continue
+            score = support(sentence, [hits[n - 1]["text"] for n in cited])
+            evidence.append((sentence, round(score, 2)))
+            if score < MIN_SUPPORT:
+                evidence_ok = False
+
+        if not evidence:
             evidence_ok = False
-        else:
-            for quote in out.evidence:
-                if normalize(quote) not in context_norm:
-                    evidence_ok = False
-                    break
 
         faith_ok += int(evidence_ok)
 
         print("\nQuery:", query)
-        print("Answer:", out.answer)
-        print("Evidence:", getattr(out, "evidence", []))
+        print("Answer:", text)
+        print("Evidence (sentence, support):", evidence)
         print("Faithfulness:", "✅" if evidence_ok else "❌")
 
         if not evidence_ok:
             print("---- Debug hint ----")
-            print("Model either did not quote OR quoted text not present in retrieved context.")
+            print("Model either did not cite OR cited sentences are not supported by the cited chunks.")
 
     print("\n=== SUMMARY ===")
-    print(f"Faithfulness (evidence-based): {faith_ok}/{total} = {faith_ok/total:.2%}")
+    print(f"Faithfulness (citation-based): {faith_ok}/{total} = {faith_ok/total:.2%}")
 
 if __name__ == "__main__":
     main()
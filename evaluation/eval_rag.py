@@ -1,13 +1,11 @@
 import json
-from rag.rag_pipeline import run_rag
-from index.search import FaissRetriever
+import re
+from rag.rag_pipeline import answer
 
-def main():
-    retriever = FaissRetriever(
-        index_path="index/chunk_index.faiss",
-        meta_path="index/chunk_metadata.json",
-    )
+_CITATION = re.compile(r"\[(\d+)\]")
 
+def main():
+    # Runs the full pipeline (VECTOR_BACKEND / RETRIEVAL_MODE from config)
     gold = json.load(open("evaluation/gold_rag_eval.json", "r", encoding="utf-8"))
 
     refusal_correct = 0
@@ -18,31 +16,22 @@ def main():
         q = g["query"]
         answerable = g["answerable"]
 
-        # retrieve context (what we *gave* the model)
-        chunks = retriever.retrieve(q, top_k=5)
-
-        # set of allowed citations from retrieved context
-        allowed = set((c["doc_id"], c["chunk_id"]) for c in chunks)
-
-        out = run_rag(q, top_k=5)
+        # hits are exactly the chunks the model was given, numbered [1..n]
+        text, hits = answer(q)
         total += 1
 
-        is_refusal = out.answer.strip().lower() == "i don't know"
+        is_refusal = text.strip().lower().startswith("i don't know")
         if (not answerable and is_refusal) or (answerable and not is_refusal):
             refusal_correct += 1
 
-        # citations should be subset of retrieved chunks
-        ok_cite = True
-        for cit in out.citations:
-            if (cit.doc_id, cit.chunk_id) not in allowed:
-                ok_cite = False
-                break
+        # citations should point at retrieved chunks
+        cited = [int(n) for n in _CITATION.findall(text)]
+        ok_cite = all(1 <= n <= len(hits) for n in cited)
         citation_valid += int(ok_cite)
 
         print("\nQuery:", q)
-        print("Answer:", out.answer)
-        print("Confidence:", out.confidence)
-        print("Citations:", [(c.doc_id, c.chunk_id) for c in out.citations])
+        print("Answer:", text)
+        print("Citations:", [(hits[n - 1]["meta"].get("source"), hits[n - 1]["id"]) for n in cited if 1 <= n <= len(hits)])
         print("Refusal OK:", "✅" if ((not answerable and is_refusal) or (answerable and not is_refusal)) else "❌")
         print("Citations OK:", "✅" if ok_cite else "❌")
 
@@ -2,10 +2,8 @@ import json
 from index.search import FaissRetriever
 
 def main():
-    retriever = FaissRetriever(
-        index_path="index/chunk_index.faiss",
-        meta_path="index/chunk_metadata.json",
-    )
+    # Reads the FAISS store built with VECTOR_BACKEND=faiss (FAISS_DIR / CHROMA_COLLECTION)
+    retriever = FaissRetriever()
 
     gold = json.load(open("evaluation/gold_rag_eval.json", "r", encoding="utf-8"))
 
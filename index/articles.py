@@ -0,0 +1,167 @@
+# index/articles.py
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import ARTICLE_INDEX_PATH
+
+# Numbered clause markers, same boundary rule as chunking.sentence_aware._CLAUSE_SPLIT
+# ("(?<=\s)|^"), but keeping the full dotted number: "48.12 Should a car ...".
+# Plain "48." markers are too ambiguous on their own, so top-level articles come
+# from their headings ("ARTICLE 48: SAFETY CAR").
+_CLAUSE_NUMBER = re.compile(r"(?:(?<=\s)|^)(\d{1,3}(?:\.\d{1,3}){1,3})(?=\s+[A-Z(\"'])")
+_ARTICLE_HEADING = re.compile(r"\bARTICLE\s+(\d{1,3})\b")
+
+# Explicit references in questions: "Article 48.12", "art. 48", "Articles 3.1"
+_ARTICLE_REF = re.compile(r"\bart(?:icle)?s?\.?\s*(\d{1,3}(?:\.\d{1,3}){0,3})\b", re.IGNORECASE)
+
+
+def find_article_refs(text: str) -> List[str]:
+    """Article numbers explicitly referenced in a question, in order (deduped)."""
+    out: List[str] = []
+    for m in _ARTICLE_REF.finditer(text or ""):
+        if m.group(1) not in out:
+            out.append(m.group(1))
+    return out
+
+
+def chunk_articles(text: str, current: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """
+    Articles a chunk belongs to, given the article still open from the previous
+    chunk of the same document. Returns (articles, article open after this chunk).
+    """
+    marks = sorted(
+        [(m.start(), m.group(1)) for m in _ARTICLE_HEADING.finditer(text)]
+        + [(m.start(), m.group(1)) for m in _CLAUSE_NUMBER.finditer(text)]
+    )
+
+    articles: List[str] = []
+    # Text before the first marker continues the previous article
+    if current and (not marks or text[: marks[0][0]].strip()):
+        articles.append(current)
+    for _, number in marks:
+        if number not in articles:
+            articles.append(number)
+        current = number
+    return articles, current
+
+
+def _scope(meta: Dict[str, Any]) -> str:
+    return f"{meta.get('season')}|{meta.get('regulation_type')}"
+
+
+def _sort_key(number: str) -> Tuple[int, ...]:
+    return tuple(int(p) for p in number.split("."))
+
+
+class ArticleIndex:
+    """
+    (season, regulation_type, article) -> chunk ids, persisted as one JSON file.
+
+    Chunks carry their articles in meta["articles"] (comma separated, see
+    build_index). Looking up "48" also returns sub-articles 48.x; "48.12"
+    returns 48.12 and its sub-clauses, exact matches first.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # chunk id -> (scope, articles): the persisted form, easy to delete from
+        self._chunks: Dict[str, Tuple[str, List[str]]] = {}
+        # scope -> article -> [chunk ids]
+        self._lookup: Dict[str, Dict[str, List[str]]] = {}
+        self._dirty = False
+        self.mtime_ns = None
+
+        if self.path.exists():
+            self.mtime_ns = self.path.stat().st_mtime_ns
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            for cid, (scope, articles) in data.get("chunks", {}).items():
+                self._index(cid, scope, articles)
+
+    def _index(self, cid: str, scope: str, articles: List[str]):
+        self._chunks[cid] = (scope, articles)
+        by_article = self._lookup.setdefault(scope, {})
+        for a in articles:
+            by_article.setdefault(a, []).append(cid)
+
+    def _unindex(self, cid: str):
+        entry = self._chunks.pop(cid, None)
+        if entry is None:
+            return
+        scope, articles = entry
+        for a in articles:
+            ids = self._lookup[scope].get(a, [])
+            if cid in ids:
+                ids.remove(cid)
+            if not ids:
+                self._lookup[scope].pop(a, None)
+
+    def add(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        with self._lock:
+            for cid, meta in zip(ids, metadatas):
+                self._unindex(cid)
+                articles = [a for a in (meta.get("articles") or "").split(",") if a]
+                if articles:
+                    self._index(cid, _scope(meta), articles)
+            self._dirty = True
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            for cid in ids:
+                if cid in self._chunks:
+                    self._unindex(cid)
+                    self._dirty = True
+
+    def save(self):
+        """Atomic write (tmp + replace); no-op if unchanged."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp.write_text(json.dumps({"chunks": self._chunks}), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self.mtime_ns = self.path.stat().st_mtime_ns
+            self._dirty = False
+
+    def lookup(
+        self,
+        article: str,
+        seasons: Optional[List[Any]] = None,
+        regulation_types: Optional[List[Any]] = None,
+    ) -> List[str]:
+        """Chunk ids for an article (and its sub-articles) within the given scope."""
+        prefix = article + "."
+        out: List[str] = []
+        with self._lock:
+            for scope, by_article in self._lookup.items():
+                season, reg_type = scope.split("|", 1)
+                if seasons is not None and season not in {str(s) for s in seasons}:
+                    continue
+                if regulation_types is not None and reg_type not in {str(r) for r in regulation_types}:
+                    continue
+                numbers = [a for a in by_article if a == article or a.startswith(prefix)]
+                for a in sorted(numbers, key=_sort_key):
+                    out.extend(cid for cid in by_article[a] if cid not in out)
+        return out
+
+
+_index: ArticleIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_article_index(path: str = ARTICLE_INDEX_PATH) -> ArticleIndex:
+    """Shared index; reloaded when another process (ingestion) rewrote the file."""
+    global _index
+    with _index_lock:
+        p = Path(path)
+        mtime = p.stat().st_mtime_ns if p.exists() else None
+        if _index is None or (mtime is not None and mtime != _index.mtime_ns and not _index._dirty):
+            _index = ArticleIndex(path)
+        return _index
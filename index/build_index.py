@@ -1,59 +1,70 @@
 from __future__ import annotations
 
 import hashlib
+from contextlib import closing
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple, Iterator
 
-from index.pdf_loader import load_pdf_pages
+from index.pdf_loader import iter_loaded_pdfs
 from chunking.sentence_aware import chunk
-from embeddings.embedder import embed_texts
-from index.chroma_store import upsert_chunks
+from chunking.structured import chunk_document
+from embeddings.embedder import embed_texts, get_cache
+from index.vector_store import upsert_chunks, delete_ids, compact, stats
+from index.lexical import get_lexical_index
+from index.articles import chunk_articles, get_article_index
 from index.metadata_infer import infer_metadata
-from config import DATASET_NAME, CHUNK_SIZE, OVERLAP_SENTENCES
+from index.pipeline import prefetch
+from index.scheduler import estimate_tokens, run_embedding_scheduler
+from index.manifest import (
+    file_sha256,
+    ingestion_settings,
+    load_manifest,
+    save_manifest,
+    is_unchanged,
+)
+from config import (
+    DATASET_NAME,
+    CHUNKER,
+    CHUNK_SIZE,
+    OVERLAP_SENTENCES,
+    INDEX_MANIFEST_PATH,
+    INGEST_BATCH_SIZE,
+    INGEST_BATCH_TOKENS,
+    INGEST_QUEUE_SIZE,
+    EMBED_CONCURRENCY,
+    LEXICAL_INDEX_ENABLED,
+    ARTICLE_LOOKUP_ENABLED,
+    ARTICLE_INDEX_PATH,
+)
+import tracing
 
 
 def stable_doc_id(source: str) -> str:
     return hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
 
 
-def build_index_from_pdfs(pdf_dir: str):
-    pdf_dir_path = Path(pdf_dir)
-
-    # 1) Load pages (pdf_loader handles cleaning)
-    pages = load_pdf_pages(pdf_dir)
+def _iter_pdf_chunks(pdf_path: Path, pages: List[Dict]) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """Stream (chunk_id, text, meta) records for one loaded PDF."""
+    source = pdf_path.name  # filename only
+    doc_id = stable_doc_id(source)
 
-    all_ids: List[str] = []
-    all_docs: List[str] = []
-    all_metas: List[Dict[str, Any]] = []
+    # Infer doc meta once per PDF (not per page)
+    doc_meta = infer_metadata(pdf_path, dataset_name=DATASET_NAME)
+    if "season" not in doc_meta:
+        print(f"⚠️ PDF missing inferred season: {source}")
 
-    # Debug counters
-    docs_seen = set()
-    season_missing_sources = set()
+    if CHUNKER == "structured":
+        yield from _iter_structured_chunks(doc_id, source, doc_meta, pages)
+        return
 
+    article = None  # article still open at the end of the previous chunk
     for p in pages:
-        source = p["source"]  # filename only
-        doc_id = stable_doc_id(source)
-
-        # Only infer doc meta once per PDF (not per page)
-        if source not in docs_seen:
-            docs_seen.add(source)
-
-        # 2) Infer metadata from filename
-        pdf_path = pdf_dir_path / source
-        doc_meta = infer_metadata(pdf_path, dataset_name=DATASET_NAME)
-
-        # If inference fails, track it (should not happen after we fix infer_metadata)
-        if "season" not in doc_meta:
-            season_missing_sources.add(source)
-
-        # 3) Chunk page text
         chunks = chunk(
             p["text"],
             chunk_size=CHUNK_SIZE,
             overlap_sentences=OVERLAP_SENTENCES,
         )
 
-        # 4) Build per-chunk records
         for ci, chunk_text in enumerate(chunks):
             chunk_id = f"{doc_id}-p{p['page']}-c{ci}"
 
@@ -66,40 +77,269 @@ def build_index_from_pdfs(pdf_dir: str):
                 "chunk_size": CHUNK_SIZE,
                 "overlap_sentences": OVERLAP_SENTENCES,
             }
+            articles, article = chunk_articles(chunk_text, article)
+            if articles:
+                base_meta["articles"] = ",".join(articles)
 
             # ✅ merge inferred doc meta into chunk meta
-            meta = {**doc_meta, **base_meta}
-
-            all_ids.append(chunk_id)
-            all_docs.append(chunk_text)
-            all_metas.append(meta)
-
-    print(f"📄 PDFs seen (from pages): {len(docs_seen)}")
-    if season_missing_sources:
-        print(f"⚠️ PDFs missing inferred season: {len(season_missing_sources)}")
-        for s in list(season_missing_sources)[:20]:
-            print(" -", s)
-
-    # 5) Embed + upsert batches
-    batch_size = 96
-    for i in range(0, len(all_docs), batch_size):
-        docs_b = all_docs[i:i + batch_size]
-        ids_b = all_ids[i:i + batch_size]
-        metas_b = all_metas[i:i + batch_size]
-
-        embeds_b = embed_texts(docs_b)
-        upsert_chunks(
-            ids=ids_b,
-            documents=docs_b,
-            embeddings=embeds_b,
-            metadatas=metas_b,
+            yield chunk_id, chunk_text, {**doc_meta, **base_meta}
+
+
+def _iter_structured_chunks(
+    doc_id: str,
+    source: str,
+    doc_meta: Dict[str, Any],
+    pages: List[Dict],
+) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """Whole-document chunks that follow the article hierarchy (CHUNKER="structured")."""
+    chunks = chunk_document(
+        pages,
+        chunk_size=CHUNK_SIZE,
+        overlap_units=OVERLAP_SENTENCES,
+    )
+    for ci, c in enumerate(chunks):
+        base_meta = {
+            "doc_id": doc_id,
+            "source": source,
+            "page": c["page"],
+            "page_end": c["page_end"],
+            "chunk_index": ci,
+            "char_start": c["start"],
+            "char_end": c["end"],
+            "article_path": c["article_path"],
+            "chunker": "structured",
+            "chunk_size": CHUNK_SIZE,
+            "overlap_sentences": OVERLAP_SENTENCES,
+        }
+        if c["articles"]:
+            base_meta["articles"] = ",".join(c["articles"])
+        yield f"{doc_id}-s{ci}", c["text"], {**doc_meta, **base_meta}
+
+
+def _iter_ingest_items(
+    jobs: List[Dict[str, Any]],
+    batch_size: int,
+    batch_tokens: int,
+) -> Iterator[tuple]:
+    """
+    Producer side of the pipeline: pages -> chunks -> token-budgeted batches.
+
+    Yields, in order:
+      ("batch", ids, docs, metas)   batches of <= batch_size chunks and ~batch_tokens
+                                    estimated tokens (may span PDFs)
+      ("pdf_done", job, chunk_ids, report)
+                                    after the batch holding a PDF's last chunk
+                                    (report: header/footer removal, see clean_pages)
+
+    So when the consumer sees "pdf_done", every chunk of that PDF is already upserted.
+    """
+    buf_ids: List[str] = []
+    buf_docs: List[str] = []
+    buf_metas: List[Dict[str, Any]] = []
+    buf_tokens = 0
+    finished: List[tuple] = []
+
+    def emit():
+        nonlocal buf_ids, buf_docs, buf_metas, buf_tokens
+        if buf_ids:
+            yield ("batch", buf_ids, buf_docs, buf_metas)
+            buf_ids, buf_docs, buf_metas = [], [], []
+            buf_tokens = 0
+        yield from finished
+        finished.clear()
+
+    # PDFs are parsed in worker processes (PDF_WORKERS) and come back in job order
+    # Hashes were computed for the manifest above; the page-text store reuses them
+    loaded = iter_loaded_pdfs([job["path"] for job in jobs], sha256s=[job["sha256"] for job in jobs])
+    for job, (pdf_path, pages, report) in zip(jobs, loaded):
+        chunk_ids: List[str] = []
+        for cid, text, meta in _iter_pdf_chunks(pdf_path, pages):
+            tokens = estimate_tokens(text)
+            if buf_ids and buf_tokens + tokens > batch_tokens:
+                yield from emit()
+
+            buf_ids.append(cid)
+            buf_docs.append(text)
+            buf_metas.append(meta)
+            buf_tokens += tokens
+            chunk_ids.append(cid)
+            if len(buf_ids) >= batch_size:
+                yield from emit()
+
+        finished.append(("pdf_done", job, chunk_ids, report))
+        if not buf_ids:
+            yield from emit()
+
+    yield from emit()
+
+
+def build_index_from_pdfs(pdf_dir: str, force: bool = False) -> Dict[str, int]:
+    """
+    Incremental, streaming ingestion driven by a persisted manifest (INDEX_MANIFEST_PATH).
+
+    Per PDF the manifest records file hash, ingestion settings and emitted chunk ids:
+    - added / changed PDFs are re-chunked, embedded and upserted
+    - stale chunk ids of changed or removed PDFs are deleted from the collection
+    - everything else is skipped
+
+    Pages -> chunks -> batches are produced in a background thread and handed to
+    embedding/upsert through a bounded queue (INGEST_QUEUE_SIZE), so memory stays
+    flat and PDF parsing overlaps with embedding calls. Several embedding calls run
+    concurrently (EMBED_CONCURRENCY) with 429 backoff; upserts stay single-writer.
+
+    With LEXICAL_INDEX_ENABLED the BM25 inverted index is written alongside the
+    vector upserts and deletes, so hybrid / lexical retrieval sees the same chunks.
+    Likewise the article index (ARTICLE_LOOKUP_ENABLED) maps the article numbers
+    found in each chunk to its id, for direct "Article 48.12" lookups.
+
+    `force=True` ignores the manifest and re-indexes every PDF.
+    Returns counts: added, updated, removed, unchanged, chunks.
+    Traced as a "build_index" span (embed / upsert batches as children).
+    """
+    with tracing.span("build_index", force=force) as sp:
+        counts = _build_index(pdf_dir, force)
+        sp.set(**counts)
+        return counts
+
+
+def _build_index(pdf_dir: str, force: bool) -> Dict[str, int]:
+    pdf_dir_path = Path(pdf_dir)
+    settings = ingestion_settings()
+
+    manifest = load_manifest(INDEX_MANIFEST_PATH)
+    docs_state: Dict[str, Any] = manifest["docs"]
+
+    # Manifest says "indexed" but the collection is empty (e.g. chroma_db wiped): start over
+    if docs_state and stats()["count"] == 0:
+        print("⚠️ Manifest found but collection is empty; re-indexing everything.")
+        docs_state.clear()
+
+    lexical = get_lexical_index() if LEXICAL_INDEX_ENABLED else None
+    if docs_state and lexical is not None and lexical.count() == 0:
+        # Embeddings come back from the embedding cache, so this is mostly chunking
+        print("⚠️ Lexical index is empty; re-indexing everything.")
+        docs_state.clear()
+
+    articles = get_article_index() if ARTICLE_LOOKUP_ENABLED else None
+    if docs_state and articles is not None and not Path(ARTICLE_INDEX_PATH).exists():
+        print("⚠️ Article index missing; re-indexing everything.")
+        docs_state.clear()
+
+    def _delete(ids: List[str]):
+        delete_ids(ids)
+        if lexical is not None:
+            lexical.delete(ids)
+        if articles is not None:
+            articles.delete(ids)
+
+    counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "chunks": 0}
+    pdf_paths = sorted(pdf_dir_path.glob("*.pdf"))
+    current = {p.name for p in pdf_paths}
+
+    # 1) PDFs that disappeared from the folder
+    for source in sorted(set(docs_state) - current):
+        _delete(docs_state[source].get("chunk_ids", []))
+        del docs_state[source]
+        counts["removed"] += 1
+
+    # 2) Added / changed PDFs (hashing is cheap; parsing happens in the pipeline)
+    jobs: List[Dict[str, Any]] = []
+    for pdf_path in pdf_paths:
+        sha = file_sha256(pdf_path)
+        entry = docs_state.get(pdf_path.name)
+        if not force and is_unchanged(entry, sha, settings):
+            counts["unchanged"] += 1
+            continue
+        jobs.append({"path": pdf_path, "sha256": sha, "entry": entry})
+
+    def _write_batch(ids_b, docs_b, embeds_b, metas_b):
+        with tracing.span("upsert", chunks=len(ids_b)):
+            upsert_chunks(
+                ids=ids_b,
+                documents=docs_b,
+                embeddings=embeds_b,
+                metadatas=metas_b,
+            )
+            if lexical is not None:
+                lexical.add(ids_b, docs_b, metas_b)
+            if articles is not None:
+                articles.add(ids_b, metas_b)
+        counts["chunks"] += len(ids_b)
+
+    def _pdf_done(item):
+        _, job, ids, report = item
+        entry = job["entry"]
+        if report["removed_lines"]:
+            print(
+                f"🧹 {job['path'].name}: removed {report['removed_lines']} header/footer lines "
+                f"({len(report['removed'])} distinct) from {report['pages']} pages"
+            )
+
+        # Chunk ids are deterministic, so upsert overwrote the surviving ones;
+        # only ids the new version no longer emits need deleting.
+        if entry:
+            stale = sorted(set(entry.get("chunk_ids", [])) - set(ids))
+            _delete(stale)
+            counts["updated"] += 1
+        else:
+            counts["added"] += 1
+
+        docs_state[job["path"].name] = {
+            "sha256": job["sha256"],
+            "settings": settings,
+            "chunk_ids": ids,
+            # What header/footer cleaning removed (per-page counts dropped to keep it small)
+            "cleaning": {k: v for k, v in report.items() if k != "removed_per_page"},
+        }
+        # Save after every PDF so an interrupted run resumes where it stopped.
+        # The article index goes first: a PDF the manifest records as done must
+        # have its articles on disk (the lexical index logs every write already).
+        if articles is not None:
+            articles.save()
+        save_manifest(INDEX_MANIFEST_PATH, manifest)
+
+    # 3) Keep EMBED_CONCURRENCY embedding calls in flight; this thread is the
+    # single writer that upserts finished batches in stream order.
+    items = _iter_ingest_items(
+        jobs,
+        batch_size=INGEST_BATCH_SIZE,
+        batch_tokens=INGEST_BATCH_TOKENS,
+    )
+    # closing(): a failed run stops the producer thread and the PDF pool right away
+    with closing(prefetch(items, maxsize=INGEST_QUEUE_SIZE)) as stream:
+        meter = run_embedding_scheduler(
+            stream,
+            embed_fn=tracing.bind(embed_texts),
+            write_batch=_write_batch,
+            on_marker=_pdf_done,
+            max_in_flight=EMBED_CONCURRENCY,
         )
 
-    # Final proof prints
+    if counts["added"] or counts["updated"] or counts["removed"]:
+        manifest["version"] = int(manifest.get("version", 0)) + 1
+        # Train / persist compressed FAISS indexes here, not on the first query
+        with tracing.span("compact"):
+            compact()
+    save_manifest(INDEX_MANIFEST_PATH, manifest)
+    if lexical is not None:
+        lexical.save()
+    if articles is not None:
+        articles.save()
+    embed_cache = get_cache()
+    if embed_cache is not None:
+        embed_cache.flush()
+
+    print(
+        f"✅ Indexed {counts['chunks']} chunks | "
+        f"added={counts['added']} updated={counts['updated']} "
+        f"removed={counts['removed']} unchanged={counts['unchanged']}"
+    )
+    rate = meter.report()
     print(
-        f"✅ Indexed {len(all_docs)} chunks from {len(docs_seen)} PDFs "
-        f"into collection (see CLI stats)."
+        f"⚡ Throughput: {rate['chunks_per_s']:.1f} chunks/s | "
+        f"~{rate['tokens_per_s']:.0f} tokens/s ({rate['seconds']:.1f}s)"
     )
+    return counts
 
 
 if __name__ == "__main__":
@@ -1,10 +1,13 @@
 # index/chroma_store.py
+import threading
+
 import chromadb
 from chromadb.config import Settings
 from config import CHROMA_DIR, CHROMA_COLLECTION
 
 _client = None
-_collection = None
+_collections: dict = {}
+_lock = threading.Lock()
 
 def get_client():
     global _client
@@ -15,20 +18,28 @@ def get_client():
         )
     return _client
 
-def get_collection():
-    global _collection
-    if _collection is None:
-        client = get_client()
-        _collection = client.get_or_create_collection(name=CHROMA_COLLECTION)
-        # Helpful when A/B testing:
-        print(f"📦 Using Chroma collection: {CHROMA_COLLECTION} (dir={CHROMA_DIR})")
-    return _collection
+def get_collection(name: str | None = None):
+    """Get (or create) a collection; defaults to CHROMA_COLLECTION."""
+    name = name or CHROMA_COLLECTION
+    with _lock:
+        if name not in _collections:
+            client = get_client()
+            _collections[name] = client.get_or_create_collection(name=name)
+            # Helpful when A/B testing:
+            print(f"📦 Using Chroma collection: {name} (dir={CHROMA_DIR})")
+        return _collections[name]
+
+def list_collections(prefix: str = "") -> list[str]:
+    """Existing collection names starting with `prefix` (does not create anything)."""
+    names = [getattr(c, "name", c) for c in get_client().list_collections()]
+    return sorted(n for n in names if n.startswith(prefix))
 
 def upsert_chunks(
     ids: list[str],
     documents: list[str],
     embeddings: list[list[float]],
     metadatas: list[dict],
+    collection: str | None = None,
 ):
     if not (len(ids) == len(documents) == len(embeddings) == len(metadatas)):
         raise ValueError(
@@ -36,7 +47,7 @@ def upsert_chunks(
             f"embeddings={len(embeddings)} metas={len(metadatas)}"
         )
 
-    col = get_collection()
+    col = get_collection(collection)
     col.upsert(
         ids=ids,
         documents=documents,
@@ -44,28 +55,69 @@ def upsert_chunks(
         metadatas=metadatas,
     )
 
+def delete_ids(ids: list[str], batch_size: int = 500, collection: str | None = None):
+    """Delete chunks by id (used to drop stale chunks of replaced/removed PDFs)."""
+    if not ids:
+        return
+    col = get_collection(collection)
+    for i in range(0, len(ids), batch_size):
+        col.delete(ids=ids[i:i + batch_size])
+
 def query(
     query_embedding: list[float],
     k: int,
     where: dict | None = None,
+    collection: str | None = None,
 ):
-    col = get_collection()
+    return query_many([query_embedding], k=k, where=where, collection=collection)[0]
+
+def query_many(
+    query_embeddings: list[list[float]],
+    k: int,
+    where: dict | None = None,
+    collection: str | None = None,
+) -> list[list[dict]]:
+    """
+    Multi-vector query: one Chroma call for all embeddings.
+    Returns one hit list per embedding (same order).
+    """
+    if not query_embeddings:
+        return []
+
+    col = get_collection(collection)
     res = col.query(
-        query_embeddings=[query_embedding],
+        query_embeddings=query_embeddings,
         n_results=k,
         where=where or None,
         include=["documents", "metadatas", "distances"],
     )
 
-    docs = res["documents"][0]
-    metas = res["metadatas"][0]
-    dists = res["distances"][0]
-
     out = []
-    for doc, meta, dist in zip(docs, metas, dists):
-        out.append({"text": doc, "meta": meta, "distance": dist})
+    for ids, docs, metas, dists in zip(res["ids"], res["documents"], res["metadatas"], res["distances"]):
+        hits = []
+        for cid, doc, meta, dist in zip(ids, docs, metas, dists):
+            hits.append({"id": cid, "text": doc, "meta": meta, "distance": dist})
+        out.append(hits)
     return out
 
-def stats():
-    col = get_collection()
+def get_chunks(ids: list[str], collection: str | None = None) -> list[dict]:
+    """
+    Direct lookup by chunk id (no embedding / ANN search).
+    Returns hits in the order of `ids`, skipping unknown ids; distance is 0.0.
+    """
+    if not ids:
+        return []
+    col = get_collection(collection)
+    res = col.get(ids=ids, include=["documents", "metadatas"])
+    found = {
+        cid: {"id": cid, "text": doc, "meta": meta, "distance": 0.0}
+        for cid, doc, meta in zip(res["ids"], res["documents"], res["metadatas"])
+    }
+    return [found[cid] for cid in ids if cid in found]
+
+def compact(collection: str | None = None):
+    """No-op: Chroma maintains its HNSW index on every write."""
+
+def stats(collection: str | None = None):
+    col = get_collection(collection)
     return {"name": col.name, "count": col.count(), "dir": CHROMA_DIR}
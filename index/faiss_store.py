@@ -0,0 +1,531 @@
+# index/faiss_store.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from config import (
+    FAISS_DIR,
+    CHROMA_COLLECTION,
+    FAISS_INDEX,
+    FAISS_HNSW_M,
+    FAISS_EF_SEARCH,
+    FAISS_BRUTE_FORCE_MAX_ROWS,
+    FAISS_QUANT,
+    FAISS_QUANT_DIM,
+    FAISS_PQ_M,
+    FAISS_RESCORE_FACTOR,
+    METADATA_INDEX_FIELDS,
+)
+from index.metadata_index import MetadataIndex, bitmap_to_rows
+
+# Row-level filter evaluation against the columnar side table
+_CMP = {
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+}
+
+# FAISS factory codes for the compressed index ("pq" -> f"PQ{FAISS_PQ_M}")
+_QUANT_CODES = {"fp16": "SQfp16", "sq8": "SQ8"}
+_TRAIN_SAMPLE = 65536  # rows used to train SQ ranges / PQ codebooks
+_ADD_BATCH = 65536     # rows copied out of the memmap at a time while building
+
+
+class FaissStore:
+    """
+    In-process vector store: same surface as index.chroma_store.
+
+    On disk (FAISS_DIR/<collection>/):
+      - vectors.f32 : contiguous float32 memory-mapped matrix (unit-normalized rows)
+      - rows.jsonl  : append-only log of row writes/deletes (id, document, metadata)
+
+    In memory:
+      - columnar side table: ids, documents, one list per metadata field, alive mask
+      - bitmap index over METADATA_INDEX_FIELDS for filter resolution
+      - a FAISS index (flat or HNSW, inner product) rebuilt lazily after writes
+
+    Compressed index (quant "fp16" / "sq8" / "pq", and/or quant_dim < dim):
+    vectors are optionally truncated to their first quant_dim dimensions
+    (Matryoshka-style, re-normalized) and quantized. Search over the codes
+    fetches k * FAISS_RESCORE_FACTOR candidates, which are rescored against
+    vectors.f32. The trained index is cached as index-<spec>.faiss and reused
+    until the store changes; build_index trains it via compact(), so queries
+    only load it (a stale or missing file is still rebuilt on first search).
+
+    Distances are squared L2 between unit vectors (2 - 2*cos), which matches
+    Chroma's default "l2" space for normalized OpenAI embeddings.
+    """
+
+    def __init__(self, root: str, name: str, quant: str = FAISS_QUANT, quant_dim: int = FAISS_QUANT_DIM):
+        if quant != "none" and quant != "pq" and quant not in _QUANT_CODES:
+            raise ValueError(f"Unknown FAISS_QUANT: {quant!r} (use 'none', 'fp16', 'sq8' or 'pq')")
+        self.name = name
+        self.dir = Path(root) / name
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._vec_path = self.dir / "vectors.f32"
+        self._log_path = self.dir / "rows.jsonl"
+        self._meta_path = self.dir / "store.json"
+
+        self._lock = threading.RLock()
+        self.dim: Optional[int] = None
+        self.capacity = 0
+        self.n_rows = 0
+        self._mm: Optional[np.memmap] = None
+
+        self.ids: List[Optional[str]] = []
+        self.documents: List[Optional[str]] = []
+        self.columns: Dict[str, List[Any]] = {}
+        self.alive: List[bool] = []
+        self._row_by_id: Dict[str, int] = {}
+        self.meta_index = MetadataIndex(METADATA_INDEX_FIELDS)
+
+        self.quant = quant
+        self.quant_dim = quant_dim
+        self.brute_force_max_rows = FAISS_BRUTE_FORCE_MAX_ROWS
+        self._index = None  # built lazily
+        self._index_compressed = False
+        self._load()
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _load(self):
+        if self._meta_path.exists():
+            info = json.loads(self._meta_path.read_text(encoding="utf-8"))
+            self.dim = info.get("dim")
+            self.capacity = int(info.get("capacity", 0))
+        if self.dim and self.capacity and self._vec_path.exists():
+            self._mm = np.memmap(self._vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+        if self._log_path.exists():
+            with open(self._log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._apply(json.loads(line))
+
+    def _save_info(self):
+        self._meta_path.write_text(
+            json.dumps({"dim": self.dim, "capacity": self.capacity}),
+            encoding="utf-8",
+        )
+
+    def _apply(self, rec: Dict[str, Any]):
+        """Replay one log record into the side table."""
+        row = rec["row"]
+        while len(self.ids) <= row:
+            self.ids.append(None)
+            self.documents.append(None)
+            self.alive.append(False)
+            for col in self.columns.values():
+                col.append(None)
+        self.n_rows = max(self.n_rows, row + 1)
+
+        if rec.get("deleted"):
+            old = self.ids[row]
+            if old is not None and self._row_by_id.get(old) == row:
+                del self._row_by_id[old]
+            self.alive[row] = False
+            self.meta_index.remove(row)
+            return
+
+        self.ids[row] = rec["id"]
+        self.documents[row] = rec["document"]
+        self.alive[row] = True
+        self._row_by_id[rec["id"]] = row
+
+        meta = rec.get("metadata") or {}
+        for field in meta:
+            if field not in self.columns:
+                self.columns[field] = [None] * len(self.ids)
+        for field, col in self.columns.items():
+            col[row] = meta.get(field)
+        self.meta_index.add(row, meta)
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self.capacity:
+            return
+        new_cap = max(needed, self.capacity * 2, 1024)
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm = None
+        with open(self._vec_path, "ab") as f:
+            f.truncate(new_cap * self.dim * 4)
+        self.capacity = new_cap
+        self._mm = np.memmap(self._vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self._save_info()
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def upsert(self, ids, documents, embeddings, metadatas):
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        if vecs.ndim != 2:
+            raise ValueError("embeddings must be a 2D list")
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = vecs / np.where(norms == 0, 1.0, norms)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vecs.shape[1])
+                self._save_info()
+            if vecs.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim mismatch: store={self.dim} got={vecs.shape[1]}")
+
+            records = []
+            next_row = self.n_rows
+            for cid, doc, meta in zip(ids, documents, metadatas):
+                row = self._row_by_id.get(cid)
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                records.append({"row": row, "id": cid, "document": doc, "metadata": meta})
+
+            self._ensure_capacity(next_row)
+            for rec, vec in zip(records, vecs):
+                self._mm[rec["row"]] = vec
+            self._mm.flush()
+
+            # Vectors first, then the log: a logged row always has its vector
+            with open(self._log_path, "a", encoding="utf-8") as f:
+                for rec in records:
+                    f.write(json.dumps(rec) + "\n")
+                    self._apply(rec)
+
+            self._index = None
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            rows = [self._row_by_id[c] for c in ids if c in self._row_by_id]
+            if not rows:
+                return
+            with open(self._log_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    rec = {"row": row, "deleted": True}
+                    f.write(json.dumps(rec) + "\n")
+                    self._apply(rec)
+            self._index = None
+
+    # -----------------------------
+    # Filters
+    # -----------------------------
+    def _match(self, where: Dict[str, Any]) -> np.ndarray:
+        """Evaluate a Chroma-style `where` filter column by column -> boolean row mask."""
+        n = self.n_rows
+        masks = []
+        for key, cond in where.items():
+            if key == "$and":
+                m = np.ones(n, dtype=bool)
+                for sub in cond:
+                    m &= self._match(sub)
+                masks.append(m)
+            elif key == "$or":
+                m = np.zeros(n, dtype=bool)
+                for sub in cond:
+                    m |= self._match(sub)
+                masks.append(m)
+            else:
+                col = self.columns.get(key, [None] * n)
+                masks.append(self._match_column(col, cond))
+
+        out = np.ones(n, dtype=bool)
+        for m in masks:
+            out &= m
+        return out
+
+    @staticmethod
+    def _match_column(col: List[Any], cond: Any) -> np.ndarray:
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        m = np.ones(len(col), dtype=bool)
+        for op, val in cond.items():
+            if op == "$eq":
+                m &= np.fromiter((v == val for v in col), dtype=bool, count=len(col))
+            elif op == "$ne":
+                m &= np.fromiter((v != val for v in col), dtype=bool, count=len(col))
+            elif op == "$in":
+                vals = set(val)
+                m &= np.fromiter((v in vals for v in col), dtype=bool, count=len(col))
+            elif op == "$nin":
+                vals = set(val)
+                m &= np.fromiter((v not in vals for v in col), dtype=bool, count=len(col))
+            elif op in _CMP:
+                fn = _CMP[op]
+                m &= np.fromiter((fn(v, val) for v in col), dtype=bool, count=len(col))
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+        return m
+
+    def allowed_rows(self, where: Dict[str, Any] | None) -> np.ndarray:
+        """
+        Sorted row ids that are alive and match `where`.
+        Filters on indexed fields resolve via bitmaps; anything else falls back
+        to a column scan.
+        """
+        bitmap = self.meta_index.resolve(where)
+        if bitmap is not None:
+            return bitmap_to_rows(bitmap, self.n_rows)
+
+        alive = np.asarray(self.alive[: self.n_rows], dtype=bool)
+        if where:
+            alive &= self._match(where)
+        return np.flatnonzero(alive)
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def _index_dim(self) -> int:
+        return self.quant_dim if 0 < self.quant_dim < self.dim else self.dim
+
+    def _compressed(self) -> bool:
+        return self.quant != "none" or self._index_dim() < self.dim
+
+    def _index_spec(self) -> str:
+        code = "Flat" if self.quant == "none" else f"PQ{FAISS_PQ_M}" if self.quant == "pq" else _QUANT_CODES[self.quant]
+        if FAISS_INDEX == "hnsw":
+            return f"HNSW{FAISS_HNSW_M},{code}"
+        if self.quant == "pq":
+            # IndexPQ can't take an id selector; a single IVF list is the same exhaustive scan and can
+            return f"IVF1,{code}"
+        return code
+
+    def _prepare(self, vecs: np.ndarray) -> np.ndarray:
+        """Vectors as the compressed index sees them: truncated to _index_dim() and re-normalized."""
+        d = self._index_dim()
+        vecs = np.asarray(vecs, dtype=np.float32)
+        if d < vecs.shape[1]:
+            vecs = vecs[:, :d]
+            norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+            vecs = vecs / np.where(norms == 0, 1.0, norms)
+        return np.ascontiguousarray(vecs)
+
+    def _build_compressed(self):
+        spec = self._index_spec()
+        d = self._index_dim()
+        path = self.dir / f"index-{spec.replace(',', '_')}-d{d}.faiss"
+        sig_path = path.with_suffix(".json")
+        sig = {
+            "rows": self.n_rows,
+            "log_bytes": self._log_path.stat().st_size if self._log_path.exists() else 0,
+        }
+        if path.exists() and sig_path.exists() and json.loads(sig_path.read_text(encoding="utf-8")) == sig:
+            index = faiss.read_index(str(path))
+            if FAISS_INDEX == "hnsw":
+                index.hnsw.efSearch = FAISS_EF_SEARCH
+            return index
+
+        alive = np.flatnonzero(np.asarray(self.alive[: self.n_rows], dtype=bool))
+        if self.quant == "pq" and alive.size < 256:
+            # PQ codebooks need >= 256 training vectors
+            print(f"⚠️ {self.name}: {alive.size} rows are too few to train PQ; using a full-precision index")
+            return None
+
+        index = faiss.index_factory(d, spec, faiss.METRIC_INNER_PRODUCT)
+        if FAISS_INDEX == "hnsw":
+            index.hnsw.efSearch = FAISS_EF_SEARCH
+        if not index.is_trained:
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(alive, size=min(_TRAIN_SAMPLE, alive.size), replace=False))
+            index.train(self._prepare(self._mm[sample]))
+        for start in range(0, self.n_rows, _ADD_BATCH):
+            index.add(self._prepare(self._mm[start: min(start + _ADD_BATCH, self.n_rows)]))
+
+        tmp = path.with_suffix(".faiss.tmp")
+        faiss.write_index(index, str(tmp))
+        os.replace(tmp, path)
+        sig_path.write_text(json.dumps(sig), encoding="utf-8")
+        print(f"🗜️ Built FAISS index {spec} (dim={d}) for {self.name}: {self.n_rows} rows")
+        return index
+
+    def _get_index(self):
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            if self.n_rows and self._compressed():
+                index = self._build_compressed()
+                if index is not None:
+                    self._index, self._index_compressed = index, True
+                    return index
+            self._index_compressed = False
+            if FAISS_INDEX == "hnsw":
+                index = faiss.IndexHNSWFlat(self.dim, FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+                index.hnsw.efSearch = FAISS_EF_SEARCH
+            else:
+                index = faiss.IndexFlatIP(self.dim)
+            if self.n_rows:
+                # FAISS ids are row numbers; dead rows are masked out at query time
+                index.add(np.ascontiguousarray(self._mm[: self.n_rows]))
+            self._index = index
+            return index
+
+    def _hits(self, rows, sims) -> List[Dict]:
+        out = []
+        with self._lock:
+            for row, sim in zip(rows, sims):
+                row = int(row)
+                # Rows deleted since the (unlocked) search are dropped here
+                if row < 0 or not self.alive[row]:
+                    continue
+                meta = {f: col[row] for f, col in self.columns.items() if col[row] is not None}
+                out.append({
+                    "id": self.ids[row],
+                    "text": self.documents[row],
+                    "meta": meta,
+                    "distance": float(2.0 - 2.0 * sim),
+                })
+        return out
+
+    @staticmethod
+    def _rescore_rows(mm: np.ndarray, q: np.ndarray, rows: np.ndarray, k: int):
+        """Re-rank compressed-index candidates with the full-precision vectors."""
+        rows = rows[rows >= 0]
+        sims = mm[rows] @ q
+        top = np.argsort(-sims, kind="stable")[:k]
+        return rows[top], sims[top]
+
+    def query_many(self, query_embeddings, k: int, where: Dict[str, Any] | None = None) -> List[List[Dict]]:
+        if not query_embeddings or not self.n_rows:
+            return [[] for _ in query_embeddings]
+
+        q = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms == 0, 1.0, norms)
+
+        # Snapshot under the lock, search without it: writers replace the index
+        # (never mutate it) and only append to / overwrite rows in the memmap.
+        with self._lock:
+            allowed = self.allowed_rows(where)
+            if allowed.size == 0:
+                return [[] for _ in query_embeddings]
+            mm = self._mm
+            brute = allowed.size <= self.brute_force_max_rows
+            if not brute:
+                index = self._get_index()
+                compressed = self._index_compressed
+            full = allowed.size == self.n_rows
+        k_eff = min(k, int(allowed.size))
+
+        # Small candidate sets: exact scan over just the allowed rows
+        if brute:
+            sims = q @ mm[allowed].T
+            top = np.argsort(-sims, axis=1)[:, :k_eff]
+            return [
+                self._hits(allowed[top[i]], sims[i, top[i]])
+                for i in range(q.shape[0])
+            ]
+
+        rescore = compressed and FAISS_RESCORE_FACTOR > 0
+        n_cand = min(int(allowed.size), k_eff * FAISS_RESCORE_FACTOR) if rescore else k_eff
+        params = None
+        if not full:
+            sel = faiss.IDSelectorBatch(allowed.astype(np.int64))
+            if FAISS_INDEX == "hnsw":
+                params = faiss.SearchParametersHNSW(sel=sel, efSearch=FAISS_EF_SEARCH)
+            elif compressed and self.quant == "pq":
+                params = faiss.SearchParametersIVF(sel=sel, nprobe=1)
+            else:
+                params = faiss.SearchParameters(sel=sel)
+        sims, rows = index.search(self._prepare(q) if compressed else q, n_cand, params=params)
+
+        if rescore:
+            return [self._hits(*self._rescore_rows(mm, q[i], rows[i], k_eff)) for i in range(q.shape[0])]
+        return [self._hits(rows[i], sims[i]) for i in range(q.shape[0])]
+
+    def get(self, ids: List[str]) -> List[Dict]:
+        """Live chunks by id, in the given order (unknown ids skipped); distance 0.0."""
+        with self._lock:
+            rows = [self._row_by_id[c] for c in ids if c in self._row_by_id]
+            return self._hits(rows, [1.0] * len(rows))
+
+    def count(self) -> int:
+        return int(sum(self.alive))
+
+    def compact(self):
+        """
+        Build (and, when compressed, train + persist) the search index now, so the
+        first query doesn't pay for it. build_index calls this after ingestion.
+        """
+        with self._lock:
+            if self.n_rows:
+                self._get_index()
+
+    def index_nbytes(self) -> int:
+        """Serialized size of the search index (builds it if needed); roughly its RAM footprint."""
+        with self._lock:
+            return int(faiss.serialize_index(self._get_index()).nbytes)
+
+
+_stores: Dict[str, FaissStore] = {}
+_store_lock = threading.Lock()
+
+
+def get_store(name: str | None = None) -> FaissStore:
+    """Get (or create) a store; defaults to CHROMA_COLLECTION."""
+    name = name or CHROMA_COLLECTION
+    with _store_lock:
+        if name not in _stores:
+            _stores[name] = FaissStore(FAISS_DIR, name)
+            print(f"📦 Using FAISS store: {name} (dir={FAISS_DIR}, index={FAISS_INDEX})")
+        return _stores[name]
+
+
+def list_collections(prefix: str = "") -> list[str]:
+    """Existing store names starting with `prefix` (does not create anything)."""
+    root = Path(FAISS_DIR)
+    if not root.exists():
+        return []
+    return sorted(p.name for p in root.iterdir() if p.is_dir() and p.name.startswith(prefix))
+
+
+# -----------------------------
+# Module API (mirrors index.chroma_store)
+# -----------------------------
+def upsert_chunks(
+    ids: list[str],
+    documents: list[str],
+    embeddings: list[list[float]],
+    metadatas: list[dict],
+    collection: str | None = None,
+):
+    if not (len(ids) == len(documents) == len(embeddings) == len(metadatas)):
+        raise ValueError(
+            f"Length mismatch: ids={len(ids)} docs={len(documents)} "
+            f"embeddings={len(embeddings)} metas={len(metadatas)}"
+        )
+    get_store(collection).upsert(ids, documents, embeddings, metadatas)
+
+def delete_ids(ids: list[str], collection: str | None = None):
+    get_store(collection).delete(ids)
+
+def query(
+    query_embedding: list[float],
+    k: int,
+    where: dict | None = None,
+    collection: str | None = None,
+):
+    return query_many([query_embedding], k=k, where=where, collection=collection)[0]
+
+def query_many(
+    query_embeddings: list[list[float]],
+    k: int,
+    where: dict | None = None,
+    collection: str | None = None,
+) -> list[list[dict]]:
+    return get_store(collection).query_many(query_embeddings, k=k, where=where)
+
+def get_chunks(ids: list[str], collection: str | None = None) -> list[dict]:
+    return get_store(collection).get(ids)
+
+def compact(collection: str | None = None):
+    get_store(collection).compact()
+
+def stats(collection: str | None = None):
+    store = get_store(collection)
+    return {"name": store.name, "count": store.count(), "dir": FAISS_DIR, "quant": store.quant}
@@ -115,3 +115,43 @@ def build_plan(query_text: str) -> QueryPlan:
         seasons=[],
         where=base,
     )
+
+
+def matches_where(meta: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Chroma-style filter against one metadata dict.
+    Supports $and/$or and $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte.
+    """
+    if not where:
+        return True
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(matches_where(meta, sub) for sub in cond):
+                return False
+        elif key == "$or":
+            if not any(matches_where(meta, sub) for sub in cond):
+                return False
+        else:
+            value = meta.get(key)
+            ops = cond if isinstance(cond, dict) else {"$eq": cond}
+            for op, target in ops.items():
+                if op == "$eq" and value != target:
+                    return False
+                if op == "$ne" and value == target:
+                    return False
+                if op == "$in" and value not in target:
+                    return False
+                if op == "$nin" and value in target:
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if op == "$gt" and not value > target:
+                        return False
+                    if op == "$gte" and not value >= target:
+                        return False
+                    if op == "$lt" and not value < target:
+                        return False
+                    if op == "$lte" and not value <= target:
+                        return False
+    return True
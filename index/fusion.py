@@ -0,0 +1,59 @@
+# index/fusion.py
+from __future__ import annotations
+
+from typing import List, Dict, Hashable
+
+
+def chunk_key(hit: Dict) -> Hashable:
+    """Chunk identity: vector-store id when present, else (source, page, chunk_index)."""
+    if hit.get("id"):
+        return hit["id"]
+    m = hit.get("meta", {})
+    return (m.get("source"), m.get("page"), m.get("chunk_index"))
+
+
+def _distance(hit: Dict) -> float:
+    # Lexical (BM25) hits carry no distance; prefer a vector copy when there is one
+    d = hit.get("distance")
+    return float("inf") if d is None else d
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Dict]],
+    k: int = 60,
+    limit: int | None = None,
+) -> List[Dict]:
+    """
+    Merge several ranked hit lists (e.g. one per query rewrite) into one.
+
+    score(chunk) = sum over rankings of 1 / (k + rank), rank starting at 1.
+    Each chunk appears once (closest-distance copy kept) with `fusion_score` attached.
+    Output is sorted by fusion score and truncated to `limit` candidates.
+    """
+    scores: Dict[Hashable, float] = {}
+    best: Dict[Hashable, Dict] = {}
+
+    for ranking in rankings:
+        seen_here = set()
+        for rank, h in enumerate(ranking, start=1):
+            key = chunk_key(h)
+            # A chunk counts once per ranking (its best rank)
+            if key in seen_here:
+                continue
+            seen_here.add(key)
+
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            prev = best.get(key)
+            if prev is None or _distance(h) < _distance(prev):
+                best[key] = h
+
+    ordered = sorted(scores, key=lambda key: scores[key], reverse=True)
+    if limit is not None:
+        ordered = ordered[:limit]
+
+    out = []
+    for key in ordered:
+        hh = dict(best[key])
+        hh["fusion_score"] = scores[key]
+        out.append(hh)
+    return out
@@ -0,0 +1,390 @@
+# index/lexical.py
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import LEXICAL_DIR, CHROMA_COLLECTION, BM25_K1, BM25_B
+from index.filters import matches_where
+from index.partitions import field_values
+
+# Article / clause numbers ("48.12", "3.1a") stay single tokens
+_TOKEN = re.compile(r"\d+(?:\.\d+)*[a-z]?|[a-z]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with which shall may must not no any all each".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, accent-folded word and article-number tokens (stopwords dropped)."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = text.encode("ascii", "ignore").decode("ascii")
+    return [t for t in _TOKEN.findall(text) if t not in _STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+def _season_key(meta: Dict[str, Any]) -> str:
+    season = meta.get("season")
+    return "" if season is None else str(season)
+
+
+class LexicalIndex:
+    """
+    Persistent BM25 inverted index with per-season postings.
+
+    On disk (under <root>/<name>/), one generation directory gen-<n>/ named by CURRENT:
+      - docs.jsonl:   append-only log of {"op": "add", id, text, meta} / {"op": "del", id}
+      - postings.bin: snapshot of doc lengths + postings (uint32 rows, uint16 term freqs)
+      - terms.json:   term -> [df, {season: [offset, count]}] and how many log records it covers
+
+    Loading maps the snapshot back into compact arrays and only tokenizes log records
+    written after it, so startup stays cheap. Text and metadata are kept alongside the
+    postings, which makes lexical-only search independent of the vector store.
+
+    save() compacts: live docs only, rows renumbered, written as the next generation
+    and switched to by replacing CURRENT, so a crash leaves one complete generation.
+    """
+
+    def __init__(self, root: str, name: str):
+        self.name = name
+        self.dir = Path(root) / name
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._current_path = self.dir / "CURRENT"
+        self._gen = 0
+
+        self._lock = threading.RLock()
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metas: List[Dict[str, Any]] = []
+        self.lengths = array("I")
+        self.alive = bytearray()
+        self._row_by_id: Dict[str, int] = {}
+
+        # term -> season -> (rows, term freqs)
+        self._postings: Dict[str, Dict[str, Tuple[array, array]]] = {}
+        self._df: Counter = Counter()
+        self._n_alive = 0
+        self._total_len = 0
+        self._log_records = 0
+        self._dirty = False
+
+        self._load()
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _set_generation(self, gen: int):
+        self._gen = gen
+        # Generation 0 is the flat layout written before generations existed
+        gen_dir = self.dir / f"gen-{gen}" if gen else self.dir
+        self.log_path = gen_dir / "docs.jsonl"
+        self.postings_path = gen_dir / "postings.bin"
+        self.terms_path = gen_dir / "terms.json"
+
+    def _load(self):
+        if self._current_path.exists():
+            gen = int(self._current_path.read_text(encoding="utf-8").strip())
+        elif (self.dir / "docs.jsonl").exists():
+            gen = 0  # flat layout; the next save() migrates it
+            self._dirty = True
+        else:
+            gen = 1
+            (self.dir / "gen-1").mkdir(exist_ok=True)
+            self._write_current(1)
+        self._set_generation(gen)
+        # Older generations, or a newer one a crash left half-written
+        for d in self.dir.glob("gen-*"):
+            if d.name != f"gen-{gen}":
+                shutil.rmtree(d, ignore_errors=True)
+
+        snap_records = 0
+        if self.terms_path.exists() and self.postings_path.exists():
+            snap_records = self._load_snapshot()
+
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                line = line.strip()
+                if not line:
+                    continue
+                rec = json.loads(line)
+                # Records covered by the snapshot only rebuild the side table
+                indexed = i < snap_records
+                if rec["op"] == "add":
+                    self._add_row(rec["id"], rec["text"], rec["meta"], indexed=indexed)
+                else:
+                    self._remove_row(rec["id"], indexed=indexed)
+                self._log_records += 1
+        if self._log_records > snap_records:
+            self._dirty = True
+
+    def _load_snapshot(self) -> int:
+        with open(self.terms_path, "r", encoding="utf-8") as f:
+            snap = json.load(f)
+        raw = self.postings_path.read_bytes()
+
+        n_rows, n_postings = snap["rows"], snap["postings"]
+        lengths = array("I")
+        lengths.frombytes(raw[: 4 * n_rows])
+        rows = array("I")
+        rows.frombytes(raw[4 * n_rows: 4 * (n_rows + n_postings)])
+        tfs = array("H")
+        tfs.frombytes(raw[4 * (n_rows + n_postings):])
+
+        self._snapshot_lengths = lengths
+        for term, (df, seasons) in snap["terms"].items():
+            self._df[term] = df
+            self._postings[term] = {
+                season: (rows[off: off + cnt], tfs[off: off + cnt])
+                for season, (off, cnt) in seasons.items()
+            }
+        self._total_len = snap["total_len"]
+        return snap["log_records"]
+
+    def _write_current(self, gen: int):
+        tmp = self._current_path.with_suffix(".tmp")
+        tmp.write_text(str(gen), encoding="utf-8")
+        os.replace(tmp, self._current_path)
+
+    def save(self):
+        """
+        Compact into a new generation (live docs only) and switch CURRENT to it
+        (no-op if unchanged). Deleted / replaced docs are dropped from the log.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            live = [row for row in range(len(self.ids)) if self.alive[row]]
+            remap = array("l", [-1]) * len(self.ids)
+            for new_row, row in enumerate(live):
+                remap[row] = new_row
+
+            postings: Dict[str, Dict[str, Tuple[array, array]]] = {}
+            df: Counter = Counter()
+            for term, seasons in self._postings.items():
+                if self._df[term] <= 0:
+                    continue
+                by_season = {}
+                for season, (r, t) in seasons.items():
+                    new_r, new_t = array("I"), array("H")
+                    for row, tf in zip(r, t):
+                        if self.alive[row]:
+                            new_r.append(remap[row])
+                            new_t.append(tf)
+                    if new_r:
+                        by_season[season] = (new_r, new_t)
+                if by_season:
+                    postings[term] = by_season
+                    df[term] = self._df[term]
+            lengths = array("I", (self.lengths[row] for row in live))
+
+            gen = self._gen + 1
+            gen_dir = self.dir / f"gen-{gen}"
+            shutil.rmtree(gen_dir, ignore_errors=True)
+            gen_dir.mkdir()
+
+            with open(gen_dir / "docs.jsonl", "w", encoding="utf-8") as f:
+                for row in live:
+                    rec = {"op": "add", "id": self.ids[row], "text": self.documents[row], "meta": self.metas[row]}
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+            rows, tfs = array("I"), array("H")
+            terms: Dict[str, Any] = {}
+            for term, seasons in postings.items():
+                entry = {}
+                for season, (r, t) in seasons.items():
+                    entry[season] = [len(rows), len(r)]
+                    rows.extend(r)
+                    tfs.extend(t)
+                terms[term] = [df[term], entry]
+            with open(gen_dir / "postings.bin", "wb") as f:
+                f.write(lengths.tobytes())
+                f.write(rows.tobytes())
+                f.write(tfs.tobytes())
+            with open(gen_dir / "terms.json", "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "log_records": len(live),
+                        "rows": len(lengths),
+                        "postings": len(rows),
+                        "total_len": self._total_len,
+                        "terms": terms,
+                    },
+                    f,
+                )
+
+            # The switch: before it the old generation is intact, after it the new one
+            self._write_current(gen)
+            old_gen = self._gen
+            if old_gen:
+                shutil.rmtree(self.dir / f"gen-{old_gen}", ignore_errors=True)
+            else:
+                for name in ("docs.jsonl", "postings.bin", "terms.json"):
+                    (self.dir / name).unlink(missing_ok=True)
+            self._set_generation(gen)
+
+            self.ids = [self.ids[row] for row in live]
+            self.documents = [self.documents[row] for row in live]
+            self.metas = [self.metas[row] for row in live]
+            self.lengths = lengths
+            self.alive = bytearray(b"\x01" * len(live))
+            self._row_by_id = {cid: row for row, cid in enumerate(self.ids)}
+            self._postings = postings
+            self._df = df
+            self._log_records = len(live)
+            self._dirty = False
+
+    def _append_log(self, records: List[Dict[str, Any]]):
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._log_records += len(records)
+        self._dirty = True
+
+    # -----------------------------
+    # Row maintenance
+    # -----------------------------
+    def _add_row(self, cid: str, text: str, meta: Dict[str, Any], indexed: bool = False):
+        self._remove_row(cid, indexed=indexed)
+        row = len(self.ids)
+        self.ids.append(cid)
+        self.documents.append(text)
+        self.metas.append(meta)
+        self.alive.append(1)
+        self._row_by_id[cid] = row
+        self._n_alive += 1
+
+        if indexed:
+            # Postings/df/total_len already include this row
+            self.lengths.append(self._snapshot_lengths[row])
+            return
+
+        tokens = tokenize(text)
+        self.lengths.append(len(tokens))
+        self._total_len += len(tokens)
+        season = _season_key(meta)
+        for term, tf in Counter(tokens).items():
+            self._df[term] += 1
+            by_season = self._postings.setdefault(term, {})
+            if season not in by_season:
+                by_season[season] = (array("I"), array("H"))
+            rows, tfs = by_season[season]
+            rows.append(row)
+            tfs.append(min(tf, 0xFFFF))
+
+    def _remove_row(self, cid: str, indexed: bool = False):
+        row = self._row_by_id.pop(cid, None)
+        if row is None or not self.alive[row]:
+            return
+        self.alive[row] = 0
+        self._n_alive -= 1
+        if indexed:
+            return
+        # Postings keep the dead row (filtered at query time); df / avgdl track live docs
+        self._total_len -= self.lengths[row]
+        for term in set(tokenize(self.documents[row])):
+            self._df[term] -= 1
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        if not (len(ids) == len(documents) == len(metadatas)):
+            raise ValueError(
+                f"Length mismatch: ids={len(ids)} docs={len(documents)} metas={len(metadatas)}"
+            )
+        with self._lock:
+            for cid, text, meta in zip(ids, documents, metadatas):
+                self._add_row(cid, text, meta)
+            self._append_log(
+                [{"op": "add", "id": c, "text": t, "meta": m} for c, t, m in zip(ids, documents, metadatas)]
+            )
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            ids = [cid for cid in ids if cid in self._row_by_id]
+            if not ids:
+                return
+            for cid in ids:
+                self._remove_row(cid)
+            self._append_log([{"op": "del", "id": cid} for cid in ids])
+
+    def count(self) -> int:
+        return self._n_alive
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def search(self, query_text: str, k: int, where: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """
+        BM25 top-k. Season pins in `where` select postings lists directly; any other
+        filter keys are checked per candidate row.
+        Hits: {"id", "text", "meta", "distance": None, "bm25"}.
+        """
+        terms = set(tokenize(query_text))
+        if not terms or k <= 0:
+            return []
+
+        with self._lock:
+            if self._n_alive == 0:
+                return []
+            pinned = field_values(where, "season")
+            seasons = None if pinned is None else {str(s) for s in pinned}
+            avgdl = self._total_len / self._n_alive
+            n = self._n_alive
+
+            scores: Dict[int, float] = {}
+            allowed: Dict[int, bool] = {}
+            for term in terms:
+                df = self._df.get(term, 0)
+                by_season = self._postings.get(term)
+                if df <= 0 or not by_season:
+                    continue
+                idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+                for season, (rows, tfs) in by_season.items():
+                    if seasons is not None and season not in seasons:
+                        continue
+                    for row, tf in zip(rows, tfs):
+                        if not self.alive[row]:
+                            continue
+                        ok = allowed.get(row)
+                        if ok is None:
+                            ok = allowed[row] = matches_where(self.metas[row], where)
+                        if not ok:
+                            continue
+                        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.lengths[row] / avgdl)
+                        scores[row] = scores.get(row, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+            top = heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+            return [
+                {
+                    "id": self.ids[row],
+                    "text": self.documents[row],
+                    "meta": self.metas[row],
+                    "distance": None,
+                    "bm25": score,
+                }
+                for row, score in top
+            ]
+
+
+_indexes: Dict[str, LexicalIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_lexical_index(name: str | None = None) -> LexicalIndex:
+    """Get (or create) the lexical index; defaults to CHROMA_COLLECTION."""
+    name = name or CHROMA_COLLECTION
+    with _index_lock:
+        if name not in _indexes:
+            _indexes[name] = LexicalIndex(LEXICAL_DIR, name)
+            print(f"📦 Using lexical index: {name} (dir={LEXICAL_DIR})")
+        return _indexes[name]
@@ -0,0 +1,103 @@
+# index/manifest.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any
+
+from config import (
+    CHUNKER,
+    CHUNK_SIZE,
+    OVERLAP_SENTENCES,
+    CLEAN_HEADERS_FOOTERS,
+    HF_MIN_PAGE_FRACTION,
+    HF_MIN_LINE_LEN,
+    HF_MAX_LINE_LEN,
+    HF_MAX_REMOVE_PER_PAGE,
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    PARTITION_BY,
+    CHROMA_COLLECTION,
+    INDEX_MANIFEST_PATH,
+)
+from embeddings.local import MODEL_ID as LOCAL_MODEL_ID
+
+# Cached view of the manifest for query-time checks (reloaded when the file changes)
+_state_cache: Dict[str, Any] = {"mtime_ns": None, "version": "", "ids": frozenset()}
+
+
+def file_sha256(path: Path) -> str:
+    """Hash file contents in blocks (regulation PDFs can be large)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def ingestion_settings() -> Dict[str, Any]:
+    """
+    Everything that changes the emitted chunks/vectors for an unchanged PDF.
+    If any of these differ from the manifest entry, the PDF is re-indexed.
+    """
+    return {
+        "chunker": CHUNKER,
+        "chunk_size": CHUNK_SIZE,
+        "overlap_sentences": OVERLAP_SENTENCES,
+        "clean_headers_footers": CLEAN_HEADERS_FOOTERS,
+        "hf_min_page_fraction": HF_MIN_PAGE_FRACTION,
+        "hf_min_line_len": HF_MIN_LINE_LEN,
+        "hf_max_line_len": HF_MAX_LINE_LEN,
+        "hf_max_remove_per_page": HF_MAX_REMOVE_PER_PAGE,
+        "embedding_model": EMBEDDING_MODEL if EMBEDDING_BACKEND == "openai" else LOCAL_MODEL_ID,
+        "partition_by": PARTITION_BY,
+    }
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """
+    Manifest schema:
+      {"version": int, "docs": {source: {"sha256", "settings", "chunk_ids"}}}
+    """
+    p = Path(path)
+    if not p.exists():
+        return {"version": 0, "docs": {}}
+    data = json.loads(p.read_text(encoding="utf-8"))
+    data.setdefault("version", 0)
+    data.setdefault("docs", {})
+    return data
+
+
+def save_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    """Atomic write (tmp + replace) so a crash never leaves a half-written manifest."""
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+    os.replace(tmp, p)
+
+
+def is_unchanged(entry: Dict[str, Any] | None, sha: str, settings: Dict[str, Any]) -> bool:
+    return bool(entry) and entry.get("sha256") == sha and entry.get("settings") == settings
+
+
+def collection_state(path: str = INDEX_MANIFEST_PATH) -> tuple[str, frozenset]:
+    """
+    (collection version token, live chunk ids) from the ingestion manifest.
+    Cheap to call per query: the manifest is only re-read when its mtime changes.
+    """
+    p = Path(path)
+    mtime_ns = p.stat().st_mtime_ns if p.exists() else None
+    if mtime_ns != _state_cache["mtime_ns"]:
+        manifest = load_manifest(path)
+        ids = frozenset(
+            cid for entry in manifest["docs"].values() for cid in entry.get("chunk_ids", [])
+        )
+        _state_cache.update(
+            mtime_ns=mtime_ns,
+            version=f"{CHROMA_COLLECTION}:{manifest['version']}",
+            ids=ids,
+        )
+    return _state_cache["version"], _state_cache["ids"]
@@ -0,0 +1,156 @@
+# index/metadata_index.py
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+_RANGE_OPS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+
+def bitmap_to_rows(bitmap: np.ndarray, n_rows: int) -> np.ndarray:
+    """Packed bitmap -> sorted row ids."""
+    bits = np.unpackbits(bitmap, bitorder="little")[:n_rows]
+    return np.flatnonzero(bits)
+
+
+class MetadataIndex:
+    """
+    Bitmap index over low-cardinality metadata fields (season, regulation_type, ...).
+
+    Each (field, value) maps to a packed bitmap (1 bit per store row), maintained
+    as rows are written/deleted. Chroma-style filters on indexed fields resolve to
+    bitmap AND/OR/ANDNOT ops, so a filtered search only touches allowed rows:
+      - $eq, $in, $ne, $nin, range ops ($gt/$gte/$lt/$lte over known values)
+      - $and, $or, implicit AND of several keys
+    resolve() returns None if the filter touches an unindexed field.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = set(fields)
+        self._nbytes = 0
+        self._bitmaps: Dict[Tuple[str, Any], np.ndarray] = {}
+        self._row_values: Dict[int, Dict[str, Any]] = {}
+        self.alive = np.zeros(0, dtype=np.uint8)
+
+    # -----------------------------
+    # Maintenance
+    # -----------------------------
+    def _grow(self, row: int):
+        needed = row // 8 + 1
+        if needed <= self._nbytes:
+            return
+        new_nbytes = max(needed, self._nbytes * 2, 128)
+        pad = new_nbytes - self._nbytes
+        self.alive = np.concatenate([self.alive, np.zeros(pad, dtype=np.uint8)])
+        for key, bm in self._bitmaps.items():
+            self._bitmaps[key] = np.concatenate([bm, np.zeros(pad, dtype=np.uint8)])
+        self._nbytes = new_nbytes
+
+    def _set(self, bm: np.ndarray, row: int, on: bool):
+        if on:
+            bm[row >> 3] |= np.uint8(1 << (row & 7))
+        else:
+            bm[row >> 3] &= np.uint8(~(1 << (row & 7)) & 0xFF)
+
+    def add(self, row: int, meta: Dict[str, Any]):
+        self.remove(row)
+        self._grow(row)
+        values = {}
+        for field in self.fields:
+            if field not in meta or meta[field] is None:
+                continue
+            key = (field, meta[field])
+            bm = self._bitmaps.get(key)
+            if bm is None:
+                bm = self._bitmaps[key] = np.zeros(self._nbytes, dtype=np.uint8)
+            self._set(bm, row, True)
+            values[field] = meta[field]
+        self._row_values[row] = values
+        self._set(self.alive, row, True)
+
+    def remove(self, row: int):
+        values = self._row_values.pop(row, None)
+        if values is None:
+            return
+        for field, value in values.items():
+            self._set(self._bitmaps[(field, value)], row, False)
+        self._set(self.alive, row, False)
+
+    def values(self, field: str) -> list:
+        """Distinct indexed values of a field (e.g. all seasons present)."""
+        return sorted(v for f, v in self._bitmaps if f == field)
+
+    # -----------------------------
+    # Filter resolution
+    # -----------------------------
+    def _empty(self) -> np.ndarray:
+        return np.zeros(self._nbytes, dtype=np.uint8)
+
+    def _union(self, field: str, values: Iterable[Any]) -> np.ndarray:
+        out = self._empty()
+        for v in values:
+            bm = self._bitmaps.get((field, v))
+            if bm is not None:
+                out |= bm
+        return out
+
+    def _resolve_field(self, field: str, cond: Any) -> Optional[np.ndarray]:
+        if field not in self.fields:
+            return None
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+
+        out = self.alive.copy()
+        for op, val in cond.items():
+            if op == "$eq":
+                out &= self._union(field, [val])
+            elif op == "$in":
+                out &= self._union(field, val)
+            elif op == "$ne":
+                out &= ~self._union(field, [val])
+            elif op == "$nin":
+                out &= ~self._union(field, val)
+            elif op in _RANGE_OPS:
+                fn = _RANGE_OPS[op]
+                known = [v for f, v in self._bitmaps if f == field]
+                try:
+                    out &= self._union(field, [v for v in known if fn(v, val)])
+                except TypeError:
+                    return None
+            else:
+                return None
+        return out
+
+    def resolve(self, where: Dict[str, Any] | None) -> Optional[np.ndarray]:
+        """Packed bitmap of alive rows matching `where`, or None if not resolvable."""
+        if not where:
+            return self.alive.copy()
+
+        out = self.alive.copy()
+        for key, cond in where.items():
+            if key == "$and":
+                for sub in cond:
+                    bm = self.resolve(sub)
+                    if bm is None:
+                        return None
+                    out &= bm
+            elif key == "$or":
+                acc = self._empty()
+                for sub in cond:
+                    bm = self.resolve(sub)
+                    if bm is None:
+                        return None
+                    acc |= bm
+                out &= acc
+            else:
+                bm = self._resolve_field(key, cond)
+                if bm is None:
+                    return None
+                out &= bm
+        return out
@@ -0,0 +1,89 @@
+# index/partitions.py
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional
+
+from config import CHROMA_COLLECTION, PARTITION_BY
+
+# Partition name = base collection + one segment per partition field:
+#   fia_sentence__season-2024__regulation_type-sporting
+_SEP = "__"
+
+
+def _slug(value: Any) -> str:
+    if value is None:
+        return "none"
+    return re.sub(r"[^A-Za-z0-9]+", "-", str(value)).strip("-").lower() or "none"
+
+
+def partition_prefix(base: str = CHROMA_COLLECTION) -> str:
+    return base + _SEP
+
+
+def partition_name(meta: Dict[str, Any], fields: List[str] = PARTITION_BY, base: str = CHROMA_COLLECTION) -> str:
+    """Physical collection a chunk with this metadata is written to."""
+    segments = [f"{f.replace('_', '-')}-{_slug(meta.get(f))}" for f in fields]
+    return partition_prefix(base) + _SEP.join(segments)
+
+
+def field_values(where: Dict[str, Any] | None, field: str) -> Optional[List[Any]]:
+    """
+    Values `field` is pinned to by a filter, or None if unconstrained/unknown.
+    Only looks through top-level keys and $and (an $or could widen the set).
+    """
+    if not where:
+        return None
+    for key, cond in where.items():
+        if key == "$and":
+            for sub in cond:
+                vals = field_values(sub, field)
+                if vals is not None:
+                    return vals
+        elif key == field:
+            if isinstance(cond, dict):
+                if "$eq" in cond:
+                    return [cond["$eq"]]
+                if "$in" in cond:
+                    return list(cond["$in"])
+                return None
+            return [cond]
+    return None
+
+
+def route(
+    where: Dict[str, Any] | None,
+    existing: List[str],
+    fields: List[str] = PARTITION_BY,
+    base: str = CHROMA_COLLECTION,
+) -> List[str]:
+    """
+    Partitions a query must visit, restricted to partitions that exist.
+
+    Fields pinned by the filter (e.g. the QueryPlan's season / $in seasons)
+    select exact partitions; unpinned fields fan out over every existing value.
+    """
+    prefix = partition_prefix(base)
+    existing = [n for n in existing if n.startswith(prefix)]
+
+    pinned = {f: field_values(where, f) for f in fields}
+    if all(v is None for v in pinned.values()):
+        return existing
+
+    wanted = []
+    for f in fields:
+        seg = f.replace("_", "-")
+        if pinned[f] is None:
+            wanted.append(None)  # wildcard
+        else:
+            wanted.append({f"{seg}-{_slug(v)}" for v in pinned[f]})
+
+    out = []
+    for name in existing:
+        segments = name[len(prefix):].split(_SEP)
+        if len(segments) != len(fields):
+            continue
+        if all(w is None or s in w for s, w in zip(segments, wanted)):
+            out.append(name)
+    return out
+
@@ -1,11 +1,17 @@
 # index/pdf_loader.py
 from __future__ import annotations
 
+import json
+import os
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Any, List, Dict, Tuple, Iterator, Iterable, Optional
 import re
-from collections import Counter
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import accumulate, islice
 
+import numpy as np
+import pypdf
 from pypdf import PdfReader
 
 from config import (
@@ -14,7 +20,11 @@ from config import (
     HF_MIN_LINE_LEN,
     HF_MAX_LINE_LEN,
     HF_MAX_REMOVE_PER_PAGE,
+    PDF_WORKERS,
+    PAGE_TEXT_CACHE_ENABLED,
+    PAGE_TEXT_CACHE_DIR,
 )
+from index.manifest import file_sha256
 
 # Common footer/header patterns (helpful for FIA-style docs)
 _RE_PAGE_X_OF_Y = re.compile(r"\bpage\s*\d+\s*(of|/)\s*\d+\b", re.IGNORECASE)
@@ -22,6 +32,17 @@ _RE_JUST_NUMBERS = re.compile(r"^\d{1,4}\s*/\s*\d{1,4}$")  # e.g. "31/120"
 _RE_DATE = re.compile(r"\b\d{1,2}\s+[A-Za-z]{3,}\s+\d{4}\b")  # e.g. "13 February 2024"
 _RE_ISSUE = re.compile(r"\bissue\s*\d{1,2}\b", re.IGNORECASE)
 
+# Bulk variants for _boilerplate_flags: lines are joined with "\x00", which no
+# pattern can match across (non-word, non-space), so one scan covers many lines.
+_SEP = "\x00"
+_RE_JUST_NUMBERS_BULK = re.compile(r"(?<![^\x00])\d{1,4}\s*/\s*\d{1,4}(?![^\x00])")
+_RE_FIA = re.compile("fia")
+_RE_COPYRIGHT = re.compile("copyright|©")
+
+# _is_boilerplate_candidate results per unique line, shared across PDFs
+_candidate_cache: Dict[str, bool] = {}
+_CANDIDATE_CACHE_MAX = 1 << 17
+
 
 def _norm_line(line: str) -> str:
     """Normalize a line for matching (strip + collapse spaces)."""
@@ -30,12 +51,15 @@ def _norm_line(line: str) -> str:
     return line
 
 
-def _extract_lines(page_text: str) -> List[str]:
-    """Split page text into normalized lines."""
+def _raw_lines(page_text: str) -> List[str]:
+    """Split extracted page text into raw lines (what the page-text store keeps)."""
     if not page_text:
         return []
     # Keep line structure: pypdf extract_text uses \n for line breaks
-    raw_lines = page_text.replace("\r\n", "\n").split("\n")
+    return page_text.replace("\r\n", "\n").split("\n")
+
+
+def _normalize_lines(raw_lines: List[str]) -> List[str]:
     lines = []
     for ln in raw_lines:
         n = _norm_line(ln)
@@ -44,6 +68,73 @@ def _extract_lines(page_text: str) -> List[str]:
     return lines
 
 
+def _extract_lines(page_text: str) -> List[str]:
+    """Split page text into normalized lines."""
+    return _normalize_lines(_raw_lines(page_text))
+
+
+# -----------------------------
+# Page-text store: raw lines per page, keyed by file hash
+# -----------------------------
+# pypdf extraction is the slowest ingestion step and the PDFs rarely change, so
+# re-chunking (CHUNKER, CHUNK_SIZE, overlap) and header/footer threshold tuning
+# reuse the stored lines instead of parsing again. One JSONL file per PDF:
+#   {"source", "extractor", "pages"}   header
+#   ["line", "line", ...]              one array of raw lines per page
+_EXTRACTOR = f"pypdf-{pypdf.__version__}"
+
+
+def _page_text_path(sha256: str) -> Path:
+    return Path(PAGE_TEXT_CACHE_DIR) / f"{sha256}.jsonl"
+
+
+def _read_page_text(path: Path) -> Optional[List[List[str]]]:
+    """Stored raw lines, or None if missing / written by another extractor / truncated."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("extractor") != _EXTRACTOR:
+                return None
+            pages = [json.loads(line) for line in f]
+    except (OSError, ValueError):
+        return None
+    return pages if len(pages) == header.get("pages") else None
+
+
+def _write_page_text(path: Path, source: str, pages_raw: List[List[str]]) -> None:
+    """Atomic write (tmp + replace) so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"source": source, "extractor": _EXTRACTOR, "pages": len(pages_raw)}) + "\n")
+        for raw in pages_raw:
+            f.write(json.dumps(raw, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def is_page_text_cached(pdf_path: Path, sha256: str | None = None) -> bool:
+    if not PAGE_TEXT_CACHE_ENABLED:
+        return False
+    return _page_text_path(sha256 or file_sha256(pdf_path)).exists()
+
+
+def extract_raw_pages(pdf_path: Path, sha256: str | None = None) -> List[List[str]]:
+    """
+    Raw text lines per page. Served from the page-text store when this exact file
+    (by content hash) was parsed before with the same pypdf version.
+    """
+    if not PAGE_TEXT_CACHE_ENABLED:
+        return [_raw_lines(page.extract_text() or "") for page in PdfReader(str(pdf_path)).pages]
+
+    path = _page_text_path(sha256 or file_sha256(pdf_path))
+    pages_raw = _read_page_text(path)
+    if pages_raw is None:
+        reader = PdfReader(str(pdf_path))
+        pages_raw = [_raw_lines(page.extract_text() or "") for page in reader.pages]
+        _write_page_text(path, pdf_path.name, pages_raw)
+    return pages_raw
+
+
 def _is_boilerplate_candidate(line: str) -> bool:
     """Heuristics to avoid removing meaningful content."""
     if not (HF_MIN_LINE_LEN <= len(line) <= HF_MAX_LINE_LEN):
@@ -67,53 +158,220 @@ def _is_boilerplate_candidate(line: str) -> bool:
     return False
 
 
-def _find_repeated_lines(pages_lines: List[List[str]], min_fraction: float) -> set[str]:
+def _boilerplate_flags(lines: List[str]) -> np.ndarray:
     """
-    Identify lines that appear on many pages of the same PDF.
-    We count line presence per page (not total occurrences).
+    _is_boilerplate_candidate for many unique lines at once.
+
+    Cached lines are looked up; the rest are joined and each pattern scans the
+    joined text once, with match offsets mapped back to lines. Falls back to the
+    per-line check if the joined text can't be mapped safely.
     """
-    if not pages_lines:
-        return set()
+    flags = np.zeros(len(lines), dtype=bool)
+    todo: List[int] = []
+    for i, ln in enumerate(lines):
+        if not (HF_MIN_LINE_LEN <= len(ln) <= HF_MAX_LINE_LEN):
+            continue
+        hit = _candidate_cache.get(ln)
+        if hit is None:
+            todo.append(i)
+        else:
+            flags[i] = hit
+    if not todo:
+        return flags
+
+    batch = [lines[i] for i in todo]
+    joined = _SEP.join(batch)
+    low = joined.lower()
+    if joined.count(_SEP) != len(batch) - 1 or len(low) != len(joined):
+        # Separator inside a line, or lower() changed lengths: offsets would not map
+        hits = [_is_boilerplate_candidate(ln) for ln in batch]
+    else:
+        lens = np.fromiter(map(len, batch), dtype=np.int64, count=len(batch))
+        starts = np.fromiter(accumulate(lens[:-1] + 1, initial=0), dtype=np.int64, count=len(batch))
+
+        def rows(pattern: "re.Pattern", text: str) -> np.ndarray:
+            pos = np.fromiter((m.start() for m in pattern.finditer(text)), dtype=np.int64)
+            return np.searchsorted(starts, pos, side="right") - 1
+
+        hit = np.zeros(len(batch), dtype=bool)
+        hit[rows(_RE_PAGE_X_OF_Y, joined)] = True
+        hit[rows(_RE_JUST_NUMBERS_BULK, joined)] = True
+        idx = rows(_RE_ISSUE, joined)
+        hit[idx[lens[idx] <= 40]] = True
+        idx = rows(_RE_FIA, low)
+        hit[idx[lens[idx] <= 80]] = True
+        hit[rows(_RE_COPYRIGHT, low)] = True
+        hits = hit.tolist()
+
+    if len(_candidate_cache) + len(batch) > _CANDIDATE_CACHE_MAX:
+        _candidate_cache.clear()
+    for i, ln, h in zip(todo, batch, hits):
+        _candidate_cache[ln] = h
+        flags[i] = h
+    return flags
+
+
+def clean_pages(pages_lines: List[List[str]], clean: bool = CLEAN_HEADERS_FOOTERS) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Header/footer removal for one PDF's per-page lines.
+    Returns (cleaned text per page, removal report).
+
+    Lines are interned to integer ids, so the work that matters scales with the
+    number of unique lines:
+    - page presence per line: one bincount over each page's unique ids
+    - a line is removed if it repeats on >= max(2, int(pages * HF_MIN_PAGE_FRACTION))
+      pages (and HF_MIN_LINE_LEN <= len <= HF_MAX_LINE_LEN) or matches a boilerplate
+      pattern; pattern checks are cached per unique line across PDFs
+    - at most HF_MAX_REMOVE_PER_PAGE lines are removed per page (first ones win)
+    """
+    vocab: Dict[str, int] = {}
+    page_ids = [
+        np.fromiter((vocab.setdefault(ln, len(vocab)) for ln in lines), dtype=np.int64, count=len(lines))
+        for lines in pages_lines
+    ]
+    uniq = list(vocab)  # id order
+    n_uniq = len(uniq)
+    # Page text = lines joined by " " with whitespace runs collapsed; lines are
+    # already stripped, so collapsing each unique line once is equivalent
+    line_text = [" ".join(ln.split()) for ln in uniq]
+
+    remove = np.zeros(n_uniq, dtype=bool)
+    repeated = np.zeros(n_uniq, dtype=bool)
+    min_pages = max(2, int(len(pages_lines) * HF_MIN_PAGE_FRACTION))
+    if clean and n_uniq:
+        presence = np.bincount(np.concatenate([np.unique(ids) for ids in page_ids]), minlength=n_uniq)
+        lengths = np.fromiter(map(len, uniq), dtype=np.int64, count=n_uniq)
+        repeated = (presence >= min_pages) & (lengths >= HF_MIN_LINE_LEN) & (lengths <= HF_MAX_LINE_LEN)
+        pattern = _boilerplate_flags(uniq)
+        remove = repeated | pattern
+
+    texts: List[str] = []
+    removed_per_page: List[int] = []
+    dropped: List[np.ndarray] = []
+    for ids in page_ids:
+        flags = remove[ids]
+        if flags.any():
+            # Safety cap prevents deleting too much from a page
+            drop = flags & (np.cumsum(flags) <= HF_MAX_REMOVE_PER_PAGE)
+            dropped.append(ids[drop])
+            ids = ids[~drop]
+            removed_per_page.append(int(drop.sum()))
+        else:
+            removed_per_page.append(0)
+        texts.append(" ".join([line_text[i] for i in ids.tolist()]))
+
+    removed_counts = np.bincount(np.concatenate(dropped), minlength=n_uniq) if dropped else np.zeros(n_uniq, dtype=np.int64)
+    report = {
+        "pages": len(pages_lines),
+        "min_pages": min_pages,
+        "lines": int(sum(len(ids) for ids in page_ids)),
+        "unique_lines": n_uniq,
+        "removed_lines": int(sum(removed_per_page)),
+        "removed_per_page": removed_per_page,
+        "removed": [
+            {"line": uniq[i], "count": int(removed_counts[i]), "reason": "repeated" if repeated[i] else "pattern"}
+            for i in np.flatnonzero(removed_counts)
+        ],
+    }
+    return texts, report
+
+
+def load_pdf(pdf_path: Path, sha256: str | None = None) -> List[Dict]:
+    """
+    Load + clean a single PDF.
+    Returns list of dicts: {"text": str, "source": filename, "page": int}
+    """
+    return load_pdf_with_report(pdf_path, sha256)[0]
 
-    page_count = len(pages_lines)
-    min_pages = max(2, int(page_count * min_fraction))
 
-    presence = Counter()
-    for lines in pages_lines:
-        for ln in set(lines):
-            presence[ln] += 1
+def load_pdf_with_report(pdf_path: Path, sha256: str | None = None) -> Tuple[List[Dict], Dict[str, Any]]:
+    """load_pdf plus the header/footer removal report from clean_pages."""
+    # Pass 1: per-page lines (page-text store, else pypdf)
+    pages_lines = [_normalize_lines(raw) for raw in extract_raw_pages(pdf_path, sha256)]
 
-    repeated = {ln for ln, c in presence.items() if c >= min_pages}
+    cleaned_texts, report = clean_pages(pages_lines)
 
-    # Safety: don't remove extremely long repeated lines (rare, but could be headings)
-    repeated = {ln for ln in repeated if HF_MIN_LINE_LEN <= len(ln) <= HF_MAX_LINE_LEN}
-    return repeated
+    # Pass 2: build final cleaned page records
+    out_pages: List[Dict] = []
+    for i, cleaned_text in enumerate(cleaned_texts):
+        if cleaned_text:
+            out_pages.append(
+                {
+                    "text": cleaned_text,
+                    "source": pdf_path.name,
+                    "page": i + 1,  # 1-indexed
+                }
+            )
+
+    return out_pages, report
+
+
+def _resolve_workers(workers: int, n_jobs: int) -> int:
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, n_jobs))
+
+
+def iter_loaded_pdfs(
+    pdf_paths: Iterable[Path],
+    workers: int = PDF_WORKERS,
+    sha256s: Optional[Iterable[str]] = None,
+) -> Iterator[Tuple[Path, List[Dict], Dict[str, Any]]]:
+    """
+    Yield (pdf_path, cleaned page records, removal report) in input order.
 
+    `sha256s` (same order as `pdf_paths`) are content hashes the caller already
+    has (build_index computes them for the manifest); without them each PDF is
+    hashed here for the page-text store lookup.
 
-def _remove_boilerplate_from_lines(lines: List[str], repeated: set[str]) -> Tuple[str, int]:
+    With workers > 1, each PDF is handed to a worker process that runs both passes
+    (line extraction + header/footer detection) locally. PDFs already in the
+    page-text store skip the pool and load in this process. Results are still
+    yielded in input order, so output is identical to the serial path. At most
+    2 PDFs per worker are in flight to keep memory bounded.
     """
-    Remove detected boilerplate lines.
-    Returns cleaned text and number of removed lines.
-    Safety cap prevents deleting too much from a page.
+    paths = list(pdf_paths)
+    hashes = list(sha256s) if sha256s is not None else [None] * len(paths)
+    if len(hashes) != len(paths):
+        raise ValueError(f"Length mismatch: pdf_paths={len(paths)} sha256s={len(hashes)}")
+    n = _resolve_workers(workers, len(paths))
+
+    if n <= 1:
+        for pdf_path, sha in zip(paths, hashes):
+            yield (pdf_path, *load_pdf_with_report(pdf_path, sha))
+        return
+
+    with ProcessPoolExecutor(max_workers=n) as ex:
+        def submit(pdf_path: Path, sha: Optional[str]) -> Future:
+            if PAGE_TEXT_CACHE_ENABLED and sha is None:
+                sha = file_sha256(pdf_path)
+            if sha and is_page_text_cached(pdf_path, sha):
+                fut: Future = Future()
+                fut.set_result(load_pdf_with_report(pdf_path, sha))
+                return fut
+            return ex.submit(load_pdf_with_report, pdf_path, sha)
+
+        todo = zip(paths, hashes)
+        pending: deque = deque()
+        for pdf_path, sha in islice(todo, 2 * n):
+            pending.append((pdf_path, submit(pdf_path, sha)))
+
+        while pending:
+            pdf_path, fut = pending.popleft()
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending.append((nxt[0], submit(*nxt)))
+            yield (pdf_path, *fut.result())
+
+
+def iter_pdf_pages(pdf_dir: str, workers: int = PDF_WORKERS) -> Iterator[Dict]:
     """
-    removed = 0
-    kept: List[str] = []
-
-    for ln in lines:
-        # Remove if:
-        # - it is in the repeated set OR matches boilerplate regex patterns
-        should_remove = (ln in repeated) or _is_boilerplate_candidate(ln)
-
-        if should_remove and removed < HF_MAX_REMOVE_PER_PAGE:
-            removed += 1
-            continue
-
-        kept.append(ln)
-
-    cleaned = " ".join(kept).strip()
-    # Normalize whitespace across the page text
-    cleaned = re.sub(r"\s+", " ", cleaned).strip()
-    return cleaned, removed
+    Stream cleaned page records PDF by PDF (sorted by filename).
+    Only a bounded number of PDFs' pages are held in memory at a time.
+    """
+    pdf_paths = sorted(Path(pdf_dir).glob("*.pdf"))
+    for _pdf_path, pages, _report in iter_loaded_pdfs(pdf_paths, workers=workers):
+        yield from pages
 
 
 def load_pdf_pages(pdf_dir: str) -> List[Dict]:
@@ -122,38 +380,7 @@ def load_pdf_pages(pdf_dir: str) -> List[Dict]:
 
     If CLEAN_HEADERS_FOOTERS is enabled:
       - detects repeated header/footer lines per PDF and removes them.
-    """
-    pdf_dir_path = Path(pdf_dir)
-    out_pages: List[Dict] = []
-
-    for pdf_path in sorted(pdf_dir_path.glob("*.pdf")):
-        reader = PdfReader(str(pdf_path))
 
-        # Pass 1: extract per-page lines
-        pages_lines: List[List[str]] = []
-        for page in reader.pages:
-            txt = page.extract_text() or ""
-            lines = _extract_lines(txt)
-            pages_lines.append(lines)
-
-        repeated: set[str] = set()
-        if CLEAN_HEADERS_FOOTERS:
-            repeated = _find_repeated_lines(pages_lines, min_fraction=HF_MIN_PAGE_FRACTION)
-
-        # Pass 2: build final cleaned page records
-        for i, lines in enumerate(pages_lines):
-            if CLEAN_HEADERS_FOOTERS:
-                cleaned_text, _removed = _remove_boilerplate_from_lines(lines, repeated)
-            else:
-                cleaned_text = re.sub(r"\s+", " ", " ".join(lines)).strip()
-
-            if cleaned_text:
-                out_pages.append(
-                    {
-                        "text": cleaned_text,
-                        "source": pdf_path.name,
-                        "page": i + 1,  # 1-indexed
-                    }
-                )
-
-    return out_pages
+    Prefer `iter_pdf_pages` for large corpora.
+    """
+    return list(iter_pdf_pages(pdf_dir))
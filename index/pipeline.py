@@ -0,0 +1,89 @@
+# index/pipeline.py
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+_SENTINEL = object()
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Group a stream into lists of `size` (last batch may be shorter)."""
+    if size <= 0:
+        raise ValueError("Batch size must be positive.")
+    batch: List[T] = []
+    for it in items:
+        batch.append(it)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _ProducerError:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def prefetch(items: Iterable[T], maxsize: int) -> Iterator[T]:
+    """
+    Run `items` in a background producer thread and yield its output through
+    a bounded queue.
+
+    - At most `maxsize` items wait in memory, so the producer can't run ahead
+      of a slow consumer (flat memory).
+    - The producer (PDF parsing / chunking) overlaps with whatever the consumer
+      does between `next()` calls (network-bound embedding + upsert).
+    - Producer exceptions are re-raised in the consumer.
+
+    Close the returned generator when the consumer stops early (e.g. with
+    contextlib.closing): that stops the producer, which closes `items`.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run():
+        try:
+            for it in items:
+                if not _put(it):
+                    return
+        except BaseException as e:  # surfaced in the consumer thread
+            _put(_ProducerError(e))
+            return
+        finally:
+            # Release what `items` holds (e.g. the PDF process pool) in this thread
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+        _put(_SENTINEL)
+
+    t = threading.Thread(target=_run, name="ingest-producer", daemon=True)
+    t.start()
+
+    try:
+        while True:
+            it = q.get()
+            if it is _SENTINEL:
+                break
+            if isinstance(it, _ProducerError):
+                raise it.exc
+            yield it
+    finally:
+        # Consumer finished or failed: release a producer blocked on a full queue
+        stop.set()
+        # Can't join ourselves (a generator collected on the producer thread)
+        if threading.current_thread() is not t:
+            t.join(timeout=5)
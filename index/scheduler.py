@@ -0,0 +1,136 @@
+# index/scheduler.py
+from __future__ import annotations
+
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List
+
+from config import EMBED_MAX_RETRIES, EMBED_BACKOFF_BASE, EMBED_BACKOFF_MAX
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for batching (~4 chars per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+def _is_rate_limit(err: Exception) -> bool:
+    """Matched by status code (openai.RateLimitError has 429), so offline ingestion never imports the SDK."""
+    return getattr(err, "status_code", None) == 429
+
+
+def _retry_after_seconds(err: Exception) -> float | None:
+    """Honor the server's Retry-After header when the 429 carries one."""
+    resp = getattr(err, "response", None)
+    headers = getattr(resp, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def call_with_backoff(
+    fn: Callable[[], Any],
+    max_retries: int = EMBED_MAX_RETRIES,
+    base_delay: float = EMBED_BACKOFF_BASE,
+    max_delay: float = EMBED_BACKOFF_MAX,
+):
+    """
+    Call `fn`, retrying on 429 (e.g. openai.RateLimitError) with exponential backoff + full jitter.
+    Concurrent workers that hit the limit together spread out instead of retrying in lockstep.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if not _is_rate_limit(e) or attempt >= max_retries:
+                raise
+            delay = _retry_after_seconds(e)
+            if delay is None:
+                delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            print(f"⏳ Rate limited (attempt {attempt + 1}/{max_retries}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class Throughput:
+    """Running chunks/s and tokens/s counters for an ingestion run."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.chunks = 0
+        self.tokens = 0
+
+    def add(self, chunks: int, tokens: int):
+        self.chunks += chunks
+        self.tokens += tokens
+
+    def report(self) -> Dict[str, float]:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return {
+            "chunks": self.chunks,
+            "tokens": self.tokens,
+            "seconds": elapsed,
+            "chunks_per_s": self.chunks / elapsed,
+            "tokens_per_s": self.tokens / elapsed,
+        }
+
+
+def run_embedding_scheduler(
+    items: Iterable[tuple],
+    embed_fn: Callable[[List[str]], List[List[float]]],
+    write_batch: Callable[[List[str], List[str], List[List[float]], List[Dict[str, Any]]], None],
+    on_marker: Callable[[tuple], None],
+    max_in_flight: int,
+) -> Throughput:
+    """
+    Keep up to `max_in_flight` embedding requests running while a single writer
+    (the calling thread) upserts finished batches.
+
+    `items` is the ingestion stream: ("batch", ids, docs, metas) entries and
+    marker tuples (anything else). Batches are written and markers handled in
+    stream order, so a marker only fires after every earlier batch is written.
+    The caller owns `items` and should close it if this raises.
+    """
+    meter = Throughput()
+    pending: deque = deque()
+
+    def _drain_head():
+        item, fut = pending.popleft()
+        if fut is None:
+            on_marker(item)
+            return
+        _, ids_b, docs_b, metas_b = item
+        embeds_b = fut.result()
+        write_batch(ids_b, docs_b, embeds_b, metas_b)
+        meter.add(len(ids_b), sum(estimate_tokens(d) for d in docs_b))
+
+    def _unwritten_batches() -> int:
+        return sum(1 for _, f in pending if f is not None)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="embed") as ex:
+        try:
+            for item in items:
+                if item[0] == "batch":
+                    docs_b = item[2]
+                    fut = ex.submit(call_with_backoff, lambda d=docs_b: embed_fn(d))
+                    pending.append((item, fut))
+                else:
+                    pending.append((item, None))
+
+                # Write whatever is already finished at the head (keeps order)
+                while pending and (pending[0][1] is None or pending[0][1].done()):
+                    _drain_head()
+                # Back-pressure: at most max_in_flight batches embedded-but-unwritten
+                while pending and _unwritten_batches() >= max_in_flight:
+                    _drain_head()
+
+            while pending:
+                _drain_head()
+        except BaseException:
+            # A failed batch ends the run: don't start the queued embedding calls
+            ex.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    return meter
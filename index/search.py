@@ -1,11 +1,157 @@
 # index/search.py
-from config import TOP_K
-from embeddings.embedder import embed_query
-from index.chroma_store import query as chroma_query
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict
+
+from config import TOP_K, RETRIEVAL_CONCURRENCY, RETRIEVAL_MODE, FUSION_RRF_K
+from embeddings.embedder import embed_query, embed_texts
+from index.fusion import reciprocal_rank_fusion
+from index.vector_store import query as store_query, query_many as store_query_many
+import tracing
+
+if RETRIEVAL_MODE not in ("vector", "hybrid", "lexical"):
+    raise ValueError(f"Unknown RETRIEVAL_MODE: {RETRIEVAL_MODE!r} (use 'vector', 'hybrid' or 'lexical')")
 
 def search(query_text: str, k: int = TOP_K, where: dict | None = None):
-    q_emb = embed_query(query_text)
-    return chroma_query(q_emb, k=k, where=where)
+    if RETRIEVAL_MODE != "vector":
+        return search_many([query_text], k=k, where=where)[0]
+    with tracing.span("search", mode=RETRIEVAL_MODE, queries=1, k=k) as sp:
+        q_emb = embed_query(query_text)
+        with tracing.span("vector_query", queries=1, k=k) as vq:
+            hits = store_query(q_emb, k=k, where=where)
+            vq.set(hits=len(hits))
+        sp.set(hits=len(hits))
+        return hits
+
+def _vector_query_many(q_embs: List[List[float]], k: int, where: dict | None) -> List[List[Dict]]:
+    with tracing.span("vector_query", queries=len(q_embs), k=k) as sp:
+        results = store_query_many(q_embs, k=k, where=where)
+        sp.set(hits=sum(len(r) for r in results))
+        return results
+
+def lexical_search_many(queries: List[str], k: int = TOP_K, where: dict | None = None) -> List[List[Dict]]:
+    """BM25 over the persistent inverted index; needs no embedding call."""
+    from index.lexical import get_lexical_index
+
+    index = get_lexical_index()
+    with tracing.span("lexical_query", queries=len(queries), k=k) as sp:
+        results = [index.search(q, k=k, where=where) for q in queries]
+        sp.set(hits=sum(len(r) for r in results))
+        return results
+
+def _fuse_hybrid(vector_hits: List[List[Dict]], lexical_hits: List[List[Dict]], k: int) -> List[List[Dict]]:
+    return [
+        reciprocal_rank_fusion([v, l], k=FUSION_RRF_K, limit=k)
+        for v, l in zip(vector_hits, lexical_hits)
+    ]
+
+def search_many(queries: List[str], k: int = TOP_K, where: dict | None = None) -> List[List[Dict]]:
+    """
+    Search several query strings (e.g. rewrites) in one round trip each way:
+    - one embed_texts batch for all queries
+    - one multi-vector Chroma query
+
+    RETRIEVAL_MODE="hybrid" runs BM25 concurrently with the vector path and fuses
+    each query's two rankings with RRF; "lexical" skips embeddings entirely.
+    Returns one hit list per query, in the same order as `queries`.
+    """
+    if not queries:
+        return []
+    queries = list(queries)
+    with tracing.span("search", mode=RETRIEVAL_MODE, queries=len(queries), k=k):
+        if RETRIEVAL_MODE == "lexical":
+            return lexical_search_many(queries, k=k, where=where)
+        if RETRIEVAL_MODE == "hybrid":
+            with ThreadPoolExecutor(max_workers=2) as ex:
+                lex = ex.submit(tracing.bind(lexical_search_many), queries, k, where)
+                vec = _vector_query_many(embed_texts(queries), k, where)
+                return _fuse_hybrid(vec, lex.result(), k)
+        q_embs = embed_texts(queries)
+        return _vector_query_many(q_embs, k, where)
+
+# -----------------------------
+# Async variants (blocking clients run in worker threads)
+# -----------------------------
+async def search_async(query_text: str, k: int = TOP_K, where: dict | None = None):
+    return await asyncio.to_thread(search, query_text, k, where)
+
+async def search_many_async(
+    queries: List[str],
+    k: int = TOP_K,
+    where: dict | None = None,
+) -> List[List[Dict]]:
+    return await asyncio.to_thread(search_many, queries, k, where)
+
+async def search_fanout_async(
+    queries: List[str],
+    wheres: List[dict | None],
+    k: int = TOP_K,
+    concurrency: int = RETRIEVAL_CONCURRENCY,
+) -> List[List[List[Dict]]]:
+    """
+    Run the same queries against several filters (e.g. one per season) concurrently.
+
+    Queries are embedded once (not at all in lexical mode); each filter then gets
+    its own multi-vector / BM25 query, at most `concurrency` at a time.
+    Returns results[where_idx][query_idx] -> hits.
+    """
+    if not queries or not wheres:
+        return [[] for _ in wheres]
+
+    queries = list(queries)
+    with tracing.span("search", mode=RETRIEVAL_MODE, queries=len(queries), k=k, fanout=len(wheres)):
+        q_embs = None
+        if RETRIEVAL_MODE != "lexical":
+            q_embs = await asyncio.to_thread(embed_texts, queries)
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def _one(where: dict | None):
+            async with sem:
+                if RETRIEVAL_MODE == "lexical":
+                    return await asyncio.to_thread(lexical_search_many, queries, k, where)
+                if RETRIEVAL_MODE == "hybrid":
+                    vec, lex = await asyncio.gather(
+                        asyncio.to_thread(_vector_query_many, q_embs, k, where),
+                        asyncio.to_thread(lexical_search_many, queries, k, where),
+                    )
+                    return _fuse_hybrid(vec, lex, k)
+                return await asyncio.to_thread(_vector_query_many, q_embs, k, where)
+
+        return list(await asyncio.gather(*[_one(w) for w in wheres]))
+
+# -----------------------------
+# Retriever for the evaluation scripts (in-process FAISS backend)
+# -----------------------------
+class FaissRetriever:
+    """
+    Retrieval over the FAISS vector store, independent of VECTOR_BACKEND.
+
+    retrieve() returns chunks shaped for evaluation:
+      {"doc_id": source filename, "chunk_id": chunk id, "text", "meta", "distance"}
+    """
+
+    def __init__(self, store_dir: str | None = None, collection: str | None = None):
+        from index.faiss_store import FaissStore, get_store
+
+        if store_dir is None and collection is None:
+            self.store = get_store()
+        else:
+            from config import FAISS_DIR, CHROMA_COLLECTION
+            self.store = FaissStore(store_dir or FAISS_DIR, collection or CHROMA_COLLECTION)
+
+    def retrieve(self, query_text: str, top_k: int = TOP_K, where: dict | None = None) -> List[Dict]:
+        q_emb = embed_query(query_text)
+        hits = self.store.query_many([q_emb], k=top_k, where=where)[0]
+        return [
+            {
+                "doc_id": h["meta"].get("source"),
+                "chunk_id": h["id"],
+                "text": h["text"],
+                "meta": h["meta"],
+                "distance": h["distance"],
+            }
+            for h in hits
+        ]
 
 #if __name__ == "__main__":
     # Example: unfiltered
@@ -0,0 +1,130 @@
+# index/vector_store.py
+# Pluggable vector store. Every backend module exposes the same surface:
+#   upsert_chunks, delete_ids, query, query_many, get_chunks, compact, stats, list_collections
+# Selected with VECTOR_BACKEND ("chroma" or "faiss").
+#
+# With PARTITION_BY set, chunks are written to one physical collection per
+# partition (e.g. per season) and queries are routed to the partitions named
+# by their filter; unpinned queries fan out in parallel and merge by distance.
+import heapq
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import VECTOR_BACKEND, PARTITION_BY, RETRIEVAL_CONCURRENCY, CHROMA_COLLECTION
+from index.partitions import partition_name, partition_prefix, route
+
+_backend = None
+_partitions: set | None = None
+_partitions_lock = threading.Lock()
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if VECTOR_BACKEND == "chroma":
+            from index import chroma_store as backend
+        elif VECTOR_BACKEND == "faiss":
+            from index import faiss_store as backend
+        else:
+            raise ValueError(f"Unknown VECTOR_BACKEND: {VECTOR_BACKEND!r} (use 'chroma' or 'faiss')")
+        _backend = backend
+    return _backend
+
+def list_partitions() -> list[str]:
+    """Existing partition collections (cached; updated as ingestion creates new ones)."""
+    global _partitions
+    with _partitions_lock:
+        if _partitions is None:
+            _partitions = set(get_backend().list_collections(partition_prefix()))
+        return sorted(_partitions)
+
+def upsert_chunks(
+    ids: list[str],
+    documents: list[str],
+    embeddings: list[list[float]],
+    metadatas: list[dict],
+):
+    if not PARTITION_BY:
+        return get_backend().upsert_chunks(
+            ids=ids,
+            documents=documents,
+            embeddings=embeddings,
+            metadatas=metadatas,
+        )
+
+    groups = defaultdict(list)
+    for i, meta in enumerate(metadatas):
+        groups[partition_name(meta)].append(i)
+
+    list_partitions()  # make sure the cache is loaded before adding to it
+    for name, idxs in groups.items():
+        get_backend().upsert_chunks(
+            ids=[ids[i] for i in idxs],
+            documents=[documents[i] for i in idxs],
+            embeddings=[embeddings[i] for i in idxs],
+            metadatas=[metadatas[i] for i in idxs],
+            collection=name,
+        )
+        with _partitions_lock:
+            _partitions.add(name)
+
+def delete_ids(ids: list[str]):
+    if not PARTITION_BY:
+        return get_backend().delete_ids(ids)
+    # Ids don't encode their partition; deleting missing ids is a no-op
+    for name in list_partitions():
+        get_backend().delete_ids(ids, collection=name)
+
+def query(query_embedding: list[float], k: int, where: dict | None = None):
+    return query_many([query_embedding], k=k, where=where)[0]
+
+def query_many(query_embeddings: list[list[float]], k: int, where: dict | None = None):
+    if not PARTITION_BY:
+        return get_backend().query_many(query_embeddings, k=k, where=where)
+
+    names = route(where, list_partitions())
+    if not names:
+        return [[] for _ in query_embeddings]
+    if len(names) == 1:
+        return get_backend().query_many(query_embeddings, k=k, where=where, collection=names[0])
+
+    # Fan out over partitions in parallel, then merge each query's hits by distance
+    with ThreadPoolExecutor(max_workers=max(1, min(RETRIEVAL_CONCURRENCY, len(names)))) as ex:
+        per_partition = list(ex.map(
+            lambda name: get_backend().query_many(query_embeddings, k=k, where=where, collection=name),
+            names,
+        ))
+
+    merged = []
+    for qi in range(len(query_embeddings)):
+        candidates = (h for res in per_partition for h in res[qi])
+        merged.append(heapq.nsmallest(k, candidates, key=lambda h: h["distance"]))
+    return merged
+
+def get_chunks(ids: list[str]) -> list[dict]:
+    """Chunks by id (direct lookup), in the order of `ids`."""
+    if not PARTITION_BY:
+        return get_backend().get_chunks(ids)
+    found = {}
+    for name in list_partitions():
+        for h in get_backend().get_chunks(ids, collection=name):
+            found[h["id"]] = h
+    return [found[cid] for cid in ids if cid in found]
+
+def compact():
+    """Prepare search indexes after ingestion (FAISS: build / train the compressed index)."""
+    if not PARTITION_BY:
+        return get_backend().compact()
+    for name in list_partitions():
+        get_backend().compact(collection=name)
+
+def stats():
+    if not PARTITION_BY:
+        return get_backend().stats()
+    names = list_partitions()
+    parts = [get_backend().stats(collection=n) for n in names]
+    return {
+        "name": f"{CHROMA_COLLECTION} ({len(names)} partitions by {','.join(PARTITION_BY)})",
+        "count": sum(p["count"] for p in parts),
+        "dir": parts[0]["dir"] if parts else None,
+    }
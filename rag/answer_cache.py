@@ -0,0 +1,156 @@
+# rag/answer_cache.py
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _WS.sub(" ", (query or "").lower()).strip()
+
+
+class AnswerCache:
+    """
+    Two-level, in-process cache for answer().
+
+    - exact:    normalized query + query-plan key
+    - semantic: same plan key and query-embedding cosine >= sim_threshold
+
+    An entry is only served if it is younger than `ttl_s`, was built against the
+    same collection version, and all of its chunk ids are still live.
+    Size-bounded with LRU eviction; hit/miss counters via stats(). A lookup may
+    try both levels, so the caller records one miss per lookup (record_miss).
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, sim_threshold: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.sim_threshold = sim_threshold
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def _key(query: str, plan_key: str) -> str:
+        return f"{normalize_query(query)}|{plan_key}"
+
+    def _valid(self, entry: Dict[str, Any], version: str, live_ids: frozenset) -> bool:
+        if time.time() - entry["created"] > self.ttl_s:
+            return False
+        if entry["version"] != version:
+            return False
+        # Live ids unknown (no manifest yet): version is the only signal
+        if live_ids and not all(cid in live_ids for cid in entry["chunk_ids"]):
+            return False
+        return True
+
+    def get_exact(self, query: str, plan_key: str, version: str, live_ids: frozenset):
+        with self._lock:
+            key = self._key(query, plan_key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not self._valid(entry, version, live_ids):
+                del self._entries[key]
+                self.invalidated += 1
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry["text"], entry["hits"]
+
+    def get_semantic(
+        self,
+        embedding: List[float],
+        plan_key: str,
+        version: str,
+        live_ids: frozenset,
+    ):
+        """Best near-duplicate question under the same plan, if above threshold."""
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if not self._valid(e, version, live_ids)]
+            for k in stale:
+                del self._entries[k]
+            self.invalidated += len(stale)
+
+            cands = [
+                (k, e) for k, e in self._entries.items()
+                if e["plan_key"] == plan_key and e["embedding"] is not None
+            ]
+            if not cands:
+                return None
+
+            q = np.asarray(embedding, dtype=np.float32)
+            q /= (np.linalg.norm(q) or 1.0)
+            mat = np.stack([e["embedding"] for _, e in cands])
+            sims = mat @ q
+
+            best = int(np.argmax(sims))
+            if float(sims[best]) < self.sim_threshold:
+                return None
+
+            key, entry = cands[best]
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            return entry["text"], entry["hits"]
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(
+        self,
+        query: str,
+        plan_key: str,
+        embedding: Optional[List[float]],
+        version: str,
+        text: str,
+        hits: List[Dict],
+    ):
+        emb = None
+        if embedding is not None:
+            # No embedding (lexical-only retrieval): entry is served by exact lookups only
+            emb = np.asarray(embedding, dtype=np.float32)
+            emb /= (np.linalg.norm(emb) or 1.0)
+
+        with self._lock:
+            key = self._key(query, plan_key)
+            self._entries[key] = {
+                "plan_key": plan_key,
+                "embedding": emb,
+                "version": version,
+                "chunk_ids": [h["id"] for h in hits if h.get("id")],
+                "created": time.time(),
+                "text": text,
+                "hits": hits,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "invalidated": self.invalidated,
+            "hit_rate": (hits / total) if total else 0.0,
+        }
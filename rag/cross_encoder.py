@@ -0,0 +1,46 @@
+# rag/cross_encoder.py
+from __future__ import annotations
+
+from config import CROSS_ENCODER_MODEL, CROSS_ENCODER_BATCH_SIZE, RERANK_MAX_CHARS
+
+_model = None
+
+
+def get_model():
+    """Load the cross-encoder once (CPU). Imported lazily: torch is heavy."""
+    global _model
+    if _model is None:
+        from sentence_transformers import CrossEncoder
+
+        _model = CrossEncoder(CROSS_ENCODER_MODEL, device="cpu")
+        print(f"🧮 Loaded cross-encoder reranker: {CROSS_ENCODER_MODEL}")
+    return _model
+
+
+def cross_encoder_rerank(
+    query: str,
+    hits: list[dict],
+    top_k: int,
+    batch_size: int = CROSS_ENCODER_BATCH_SIZE,
+) -> list[dict]:
+    """
+    Local reranker: score (query, chunk) pairs with a cross-encoder in batches.
+    Same contract as the LLM reranker: returns hits sorted by `rerank_score`.
+    """
+    if not hits:
+        return []
+
+    # Local import avoids a cycle (reranker dispatches to this module)
+    from rag.reranker import _clip
+
+    pairs = [(query, _clip(h.get("text", ""), RERANK_MAX_CHARS)) for h in hits]
+    scores = get_model().predict(pairs, batch_size=batch_size, show_progress_bar=False)
+
+    scored = []
+    for h, score in zip(hits, scores):
+        hh = dict(h)
+        hh["rerank_score"] = float(score)
+        scored.append(hh)
+
+    scored.sort(key=lambda x: x["rerank_score"], reverse=True)
+    return scored[:top_k]
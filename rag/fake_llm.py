@@ -0,0 +1,82 @@
+# rag/fake_llm.py
+from __future__ import annotations
+
+import ast
+import json
+import re
+from types import SimpleNamespace
+from typing import Iterator, List
+
+from index.lexical import tokenize
+
+_REFUSAL = "I don't know based on the provided documents."
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _section(prompt: str, name: str, next_name: str | None = None) -> str:
+    """Text between "NAME:" and the next "NEXT_NAME:" header of one of our prompts."""
+    start = prompt.find(f"\n{name}:\n")
+    if start < 0:
+        return ""
+    start += len(name) + 3
+    end = prompt.find(f"\n{next_name}:\n", start) if next_name else -1
+    return prompt[start:end if end >= 0 else None].strip()
+
+
+def _overlap(question: List[str], text: str) -> float:
+    q = set(question)
+    return len(q & set(tokenize(text))) / len(q) if q else 0.0
+
+
+def _rerank(prompt: str) -> str:
+    question = tokenize(_section(prompt, "QUESTION", "CANDIDATES"))
+    candidates = ast.literal_eval(_section(prompt, "CANDIDATES") or "[]")
+    ranking = [{"i": c["i"], "score": round(100 * _overlap(question, c["text"]))} for c in candidates]
+    return json.dumps({"ranking": ranking})
+
+
+def _generate(prompt: str) -> str:
+    question = tokenize(_section(prompt, "QUESTION", "CITATION INDEX"))
+    chunks = _section(prompt, "CONTEXT", "QUESTION").split("\n\n---\n\n")
+
+    best, best_score = 0, 0.0
+    for i, chunk in enumerate(chunks, start=1):
+        score = _overlap(question, chunk)
+        if score > best_score:
+            best, best_score = i, score
+    if not best:
+        return _REFUSAL
+    body = chunks[best - 1].split("\n", 1)[-1]  # drop the "CHUNK i | ..." header
+    return f"{' '.join(_SENTENCE.split(body)[:2])} [{best}]"
+
+
+def _stream(resp) -> Iterator[SimpleNamespace]:
+    """Responses API streaming events: word-sized text deltas, then the full response."""
+    for piece in re.findall(r"\s*\S+\s*", resp.output_text):
+        yield SimpleNamespace(type="response.output_text.delta", delta=piece)
+    yield SimpleNamespace(type="response.completed", response=resp)
+
+
+class _Responses:
+    def create(self, model: str, input: str, stream: bool = False, **kwargs):
+        text = _rerank(input) if "CANDIDATES:\n" in input else _generate(input)
+        # Rough token counts (~4 chars per token), so traces show plausible usage
+        usage = SimpleNamespace(input_tokens=len(input) // 4, output_tokens=len(text) // 4)
+        usage.total_tokens = usage.input_tokens + usage.output_tokens
+        resp = SimpleNamespace(output_text=text, model=f"fake:{model}", usage=usage)
+        return _stream(resp) if stream else resp
+
+
+class FakeLLMClient:
+    """
+    Offline stand-in for the OpenAI client (LLM_BACKEND="fake"), covering the
+    one call the pipeline makes: responses.create(model=..., input=prompt),
+    optionally with stream=True.
+
+    Deterministic and instant: rerank prompts get scores from question/candidate
+    token overlap, answer prompts get the leading sentences of the best matching
+    chunk with its citation (or the refusal line when nothing overlaps).
+    """
+
+    def __init__(self):
+        self.responses = _Responses()
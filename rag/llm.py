@@ -0,0 +1,13 @@
+# rag/llm.py
+from config import OPENAI_API_KEY, LLM_BACKEND
+
+
+def make_client():
+    """OpenAI client for generation / LLM reranking, or the offline fake (LLM_BACKEND="fake")."""
+    if LLM_BACKEND == "fake":
+        from rag.fake_llm import FakeLLMClient
+        return FakeLLMClient()
+    if LLM_BACKEND != "openai":
+        raise ValueError(f"Unknown LLM_BACKEND: {LLM_BACKEND!r} (use 'openai' or 'fake')")
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
@@ -1,26 +1,51 @@
 # rag/rag_pipeline.py
 from __future__ import annotations
 
-from typing import List, Dict, Any
-from openai import OpenAI
+import asyncio
+import json
+import queue
+import threading
+import time
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Dict, Iterator, List
 
 from config import (
-    OPENAI_API_KEY,
     GEN_MODEL,
     TOP_K,
     RERANK_ENABLED,
     RECALL_K,
+    FUSION_RRF_K,
+    FUSION_MAX_CANDIDATES,
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_S,
+    ANSWER_CACHE_SIM_THRESHOLD,
+    RETRIEVAL_MODE,
+    ARTICLE_LOOKUP_ENABLED,
+    ARTICLE_LOOKUP_MAX_CHUNKS,
 )
 
-from index.search import search
+from embeddings.embedder import embed_query
+
+from index.search import search_many_async, search_fanout_async
 from index.filters import build_plan
+from index.fusion import reciprocal_rank_fusion
+from index.manifest import collection_state
+from index.articles import find_article_refs, get_article_index
+from index.partitions import field_values
+from index.vector_store import get_chunks
 
 
 from rag.query_rewriter import rewrite_query
 from rag.reranker import rerank
+from rag.answer_cache import AnswerCache
+from rag.llm import make_client
+import tracing
+
 
+client = make_client()
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+_answer_cache: AnswerCache | None = None
 
 
 # -----------------------------
@@ -89,44 +114,99 @@ def enforce_per_season_min(
 
 
 # -----------------------------
-# Main entrypoint
+# Pipeline stages
 # -----------------------------
-def answer(query: str, where: Dict[str, Any] | None = None):
-
-    # -----------------------------
-    # Query plan
-    # -----------------------------
-    plan = build_plan(query) if where is None else None
+async def _recall_async(query: str, where: Dict[str, Any] | None, plan) -> List[Dict]:
+    """
+    Wide recall over all rewrites. Comparison plans fan out one retrieval per
+    season concurrently, so wall-clock approaches the slowest single call.
 
-    # -----------------------------
-    # Query rewriting
-    # -----------------------------
-    queries = rewrite_query(query)
-    hits: List[Dict] = []
+    Per-rewrite rankings are merged with reciprocal-rank fusion, so each chunk
+    reaches the reranker once and the candidate set stays bounded.
+    """
+    with tracing.span("rewrite") as sp:
+        queries = rewrite_query(query)
+        sp.set(queries=len(queries))
 
     if plan and plan.is_comparison and plan.seasons:
         recall_per_season = max(10, RECALL_K // len(plan.seasons))
+        fused_per_season = max(10, FUSION_MAX_CANDIDATES // len(plan.seasons))
 
-        for season in plan.seasons:
-            season_where = {
+        season_wheres = [
+            {
                 "$and": [
                     {"doc_type": "fia_f1_regulations"},
                     {"season": season},
                 ]
             }
+            for season in plan.seasons
+        ]
+
+        # Fuse within each season so one season can't crowd out the other
+        hits: List[Dict] = []
+        per_season = await search_fanout_async(queries, season_wheres, k=recall_per_season)
+        for season_results in per_season:
+            hits.extend(
+                reciprocal_rank_fusion(season_results, k=FUSION_RRF_K, limit=fused_per_season)
+            )
+        return hits
+
+    base_where = where if where is not None else (plan.where if plan else None)
+    rankings = await search_many_async(queries, k=RECALL_K, where=base_where)
+    return reciprocal_rank_fusion(rankings, k=FUSION_RRF_K, limit=FUSION_MAX_CANDIDATES)
 
-            for qx in queries:
-                hits.extend(search(qx, k=recall_per_season, where=season_where))
 
+def _article_lookup(query: str, where: Dict[str, Any] | None, plan, top_k: int = TOP_K) -> List[Dict]:
+    """
+    Direct lookup for explicit "Article 48.12" questions, scoped by the plan's
+    season / regulation type. Returns at most min(top_k, ARTICLE_LOOKUP_MAX_CHUNKS)
+    chunks, or [] when there is no reference or no match, so the caller falls
+    back to recall + rerank.
+
+    Unless a single season is pinned, matches are ordered newest season first and
+    balanced per season (as in _select), so no season takes every slot.
+    """
+    refs = find_article_refs(query)
+    if not refs:
+        return []
+
+    scope = where if where is not None else (plan.where if plan else None)
+    seasons = field_values(scope, "season")
+    index = get_article_index()
+    ids: List[str] = []
+    for ref in refs:
+        for cid in index.lookup(
+            ref,
+            seasons=seasons,
+            regulation_types=field_values(scope, "regulation_type"),
+        ):
+            if cid not in ids:
+                ids.append(cid)
+
+    limit = min(top_k, ARTICLE_LOOKUP_MAX_CHUNKS)
+    if seasons is not None and len(seasons) == 1:
+        return get_chunks(ids[:limit])
+
+    # Stable sort: article order is kept within a season
+    hits = sorted(get_chunks(ids), key=lambda h: _season_rank(h["meta"].get("season")), reverse=True)
+    if plan and plan.is_comparison and plan.seasons:
+        balance = plan.seasons
     else:
-        base_where = where if where is not None else (plan.where if plan else None)
+        balance = sorted({h["meta"].get("season") for h in hits}, key=_season_rank, reverse=True)
+    return enforce_per_season_min(hits=hits, seasons=balance, top_k=limit, min_per_season=2)
 
-        for qx in queries:
-            hits.extend(search(qx, k=RECALL_K, where=base_where))
 
-        # -----------------------------
-        # 2) RERANK (PRECISION)
-        # -----------------------------
+def _season_rank(season: Any) -> int:
+    try:
+        return int(season)
+    except (TypeError, ValueError):
+        return -1
+
+
+def _select(query: str, hits: List[Dict], plan) -> List[Dict]:
+    # -----------------------------
+    # 2) RERANK (PRECISION)
+    # -----------------------------
     if RERANK_ENABLED:
         hits = rerank(query, hits, top_k=max(TOP_K, 12))
     else:
@@ -144,14 +224,14 @@ def answer(query: str, where: Dict[str, Any] | None = None):
             )
         else:
             hits = hits[:TOP_K]
+    return hits
 
-    # -----------------------------
-    # 3) GENERATION
-    # -----------------------------
+
+def build_prompt(query: str, hits: List[Dict]) -> str:
     context = build_context(hits)
     citations = format_citations(hits)
 
-    prompt = f"""
+    return f"""
 You are a RAG assistant.
 Rules:
 - Answer ONLY using the provided CONTEXT.
@@ -174,9 +254,261 @@ CITATION INDEX:
 {citations}
 """.strip()
 
-    resp = client.responses.create(
-        model=GEN_MODEL,
-        input=prompt,
+
+# -----------------------------
+# Main entrypoints
+# -----------------------------
+def get_answer_cache() -> AnswerCache | None:
+    global _answer_cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if _answer_cache is None:
+        _answer_cache = AnswerCache(
+            max_entries=ANSWER_CACHE_MAX_ENTRIES,
+            ttl_s=ANSWER_CACHE_TTL_S,
+            sim_threshold=ANSWER_CACHE_SIM_THRESHOLD,
+        )
+    return _answer_cache
+
+
+def _plan_key(plan, where: Dict[str, Any] | None) -> str:
+    """Stable key for what will be retrieved: the QueryPlan, or an explicit filter."""
+    if plan is not None:
+        return json.dumps(asdict(plan), sort_keys=True)
+    return json.dumps({"where": where}, sort_keys=True)
+
+
+async def answer_async(query: str, where: Dict[str, Any] | None = None):
+    """
+    Async end-to-end RAG: plan -> rewrite -> concurrent recall -> rerank -> generate.
+    Returns (answer_text, hits).
+
+    Questions naming an article ("Article 48.12") are resolved through the
+    article index instead, skipping recall and rerank.
+
+    Repeated / near-duplicate questions are served from the answer cache
+    (exact: query + plan, semantic: query-embedding similarity).
+
+    Traced as an "answer" span with one child span per stage (see tracing.py).
+    """
+    with tracing.span("answer", mode=RETRIEVAL_MODE) as sp:
+        cached, hits, remember = await _prepare_async(query, where, sp)
+        if cached is not None:
+            text, hits = cached
+        else:
+            text = await _generate_async(build_prompt(query, hits), len(hits))
+            remember(text)
+        sp.set(hits=len(hits))
+        return text, hits
+
+
+async def answer_stream_async(query: str, where: Dict[str, Any] | None = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of answer_async (same retrieval, caching and tracing).
+
+    Yields {"type": "delta", "text"} as generated text arrives, then one
+    {"type": "done", "text", "hits", "citations"} with the full answer.
+    Cached answers arrive as a single delta.
+    """
+    with tracing.span("answer", mode=RETRIEVAL_MODE, stream=True) as sp:
+        cached, hits, remember = await _prepare_async(query, where, sp)
+        if cached is not None:
+            text, hits = cached
+            yield {"type": "delta", "text": text}
+        else:
+            parts: List[str] = []
+            async for delta in _generate_stream(build_prompt(query, hits), len(hits)):
+                parts.append(delta)
+                yield {"type": "delta", "text": delta}
+            text = "".join(parts)
+            remember(text)
+        sp.set(hits=len(hits))
+        yield {"type": "done", "text": text, "hits": hits, "citations": format_citations(hits)}
+
+
+async def _prepare_async(query: str, where: Dict[str, Any] | None, trace):
+    """
+    Everything before generation.
+    Returns (cached (text, hits) or None, hits, remember) where remember(text)
+    stores the generated answer in the answer cache.
+    """
+    # -----------------------------
+    # Query plan
+    # -----------------------------
+    plan = build_plan(query) if where is None else None
+
+    # -----------------------------
+    # 0) ANSWER CACHE
+    # -----------------------------
+    cache = get_answer_cache()
+    if cache is not None:
+        plan_key = _plan_key(plan, where)
+        version, live_ids = collection_state()
+
+        cached = cache.get_exact(query, plan_key, version, live_ids)
+        if cached is not None:
+            trace.set(cache="exact")
+            return cached, cached[1], None
+
+    # -----------------------------
+    # 0.5) DIRECT ARTICLE LOOKUP
+    # -----------------------------
+    hits: List[Dict] = []
+    if ARTICLE_LOOKUP_ENABLED:
+        with tracing.span("article_lookup") as sp:
+            hits = await asyncio.to_thread(_article_lookup, query, where, plan)
+            sp.set(hits=len(hits))
+
+    q_emb = None
+    if not hits:
+        # The original query is also the first rewrite, so this embedding is
+        # reused from the embedding cache during recall. Lexical-only retrieval
+        # makes no embedding calls, so it only gets the exact level.
+        if cache is not None and RETRIEVAL_MODE != "lexical":
+            q_emb = await asyncio.to_thread(embed_query, query)
+            cached = cache.get_semantic(q_emb, plan_key, version, live_ids)
+            if cached is not None:
+                trace.set(cache="semantic")
+                return cached, cached[1], None
+
+        # -----------------------------
+        # 1) RECALL (rewrites x seasons, concurrent)
+        # -----------------------------
+        with tracing.span("recall") as sp:
+            hits = await _recall_async(query, where, plan)
+            sp.set(candidates=len(hits))
+
+        # Reranker is a blocking LLM call; keep it off the event loop
+        hits = await asyncio.to_thread(_select, query, hits, plan)
+
+    # One miss per lookup, whichever levels it went through
+    if cache is not None:
+        cache.record_miss()
+        trace.set(cache="miss")
+
+    def remember(text: str):
+        if cache is not None:
+            cache.put(query, plan_key, q_emb, version, text, hits)
+
+    return None, hits, remember
+
+
+# -----------------------------
+# 3) GENERATION
+# -----------------------------
+async def _generate_async(prompt: str, n_chunks: int) -> str:
+    with tracing.span("generate", model=GEN_MODEL, chunks=n_chunks, prompt_chars=len(prompt)) as sp:
+        # Sync client in a worker thread: safe across repeated asyncio.run() calls
+        resp = await asyncio.to_thread(
+            client.responses.create,
+            model=GEN_MODEL,
+            input=prompt,
+        )
+        tracing.add_usage(resp, sp)
+        return resp.output_text
+
+
+_STREAM_FAILURES = {"response.failed", "response.incomplete", "error"}
+
+
+def _stream_failure(event) -> str:
+    """Readable reason for a failed / incomplete / error stream event."""
+    resp = getattr(event, "response", None)
+    detail = (
+        getattr(getattr(resp, "error", None), "message", None)
+        or getattr(getattr(resp, "incomplete_details", None), "reason", None)
+        or getattr(event, "message", None)
+        or getattr(event, "code", None)
     )
+    return f"{event.type}: {detail}" if detail else event.type
+
+
+async def _generate_stream(prompt: str, n_chunks: int) -> AsyncIterator[str]:
+    """
+    Text deltas from a streamed responses.create. The sync stream is consumed in a
+    worker thread and handed over through an asyncio.Queue; stopping early closes it.
+    Raises RuntimeError if the stream fails or ends without response.completed, so
+    partial text never reaches the answer cache.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            stream = client.responses.create(model=GEN_MODEL, input=prompt, stream=True)
+            try:
+                for event in stream:
+                    if stop.is_set():
+                        break
+                    if event.type == "response.output_text.delta":
+                        loop.call_soon_threadsafe(events.put_nowait, ("delta", event.delta))
+                    elif event.type == "response.completed":
+                        loop.call_soon_threadsafe(events.put_nowait, ("completed", event.response))
+                    elif event.type in _STREAM_FAILURES:
+                        raise RuntimeError(f"Generation stream failed ({_stream_failure(event)})")
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, ("error", e))
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, ("end", None))
+
+    with tracing.span("generate", model=GEN_MODEL, chunks=n_chunks, prompt_chars=len(prompt), stream=True) as sp:
+        start = time.perf_counter()
+        first = True
+        completed = False
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        try:
+            while True:
+                kind, value = await events.get()
+                if kind == "delta":
+                    if first:
+                        sp.set(ttft_ms=round((time.perf_counter() - start) * 1000, 1))
+                        first = False
+                    yield value
+                elif kind == "completed":
+                    completed = True
+                    tracing.add_usage(value, sp)
+                elif kind == "error":
+                    raise value
+                else:
+                    break
+            if not completed:
+                raise RuntimeError("Generation stream ended without response.completed")
+        finally:
+            stop.set()
+            await producer
+
 
-    return resp.output_text, hits
+def answer(query: str, where: Dict[str, Any] | None = None):
+    """Sync wrapper around answer_async (CLI / scripts)."""
+    return asyncio.run(answer_async(query, where))
+
+
+def answer_stream(query: str, where: Dict[str, Any] | None = None) -> Iterator[Dict[str, Any]]:
+    """
+    Sync wrapper around answer_stream_async (CLI): the async generator runs in one
+    event loop on a worker thread and events are handed over as they arrive.
+    """
+    events: "queue.Queue" = queue.Queue()
+
+    async def pump():
+        async for event in answer_stream_async(query, where):
+            events.put(event)
+
+    def run():
+        try:
+            asyncio.run(pump())
+        except BaseException as e:
+            events.put(e)
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+    while (event := events.get()) is not None:
+        if isinstance(event, BaseException):
+            raise event
+        yield event
@@ -0,0 +1,117 @@
+# rag/rerank_cache.py
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from rag.answer_cache import normalize_query
+
+
+class RerankScoreCache:
+    """
+    Persistent rerank score cache (SQLite), keyed by (normalized query, chunk id,
+    chunk text hash, model). Chunk ids survive re-indexing a changed PDF, so the
+    text hash keeps an old score from being served for new text.
+
+    Bounded LRU: every hit refreshes `last_used`; when the table grows past
+    `max_entries`, the least recently used rows are deleted.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        cols = {row[1] for row in self._db.execute("PRAGMA table_info(scores)")}
+        if cols and "text_sha" not in cols:
+            # Written before scores were keyed by chunk text; can't be validated
+            self._db.execute("DROP TABLE scores")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scores (
+                query TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                text_sha TEXT NOT NULL,
+                model TEXT NOT NULL,
+                score REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (query, chunk_id, text_sha, model)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_scores_last_used ON scores(last_used)")
+        self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, query: str, text_shas: Dict[str, str], model: str) -> Dict[str, float]:
+        """Return {chunk_id: score} for the cached subset of `text_shas` ({chunk_id: text hash})."""
+        if not text_shas:
+            return {}
+        q = normalize_query(query)
+        chunk_ids = list(text_shas)
+        found: Dict[str, float] = {}
+
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(chunk_ids), 500):
+                part = chunk_ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._db.execute(
+                    f"SELECT chunk_id, text_sha, score FROM scores "
+                    f"WHERE query = ? AND model = ? AND chunk_id IN ({marks})",
+                    [q, model, *part],
+                ).fetchall()
+                found.update((cid, score) for cid, sha, score in rows if text_shas[cid] == sha)
+
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE scores SET last_used = ? "
+                    "WHERE query = ? AND chunk_id = ? AND text_sha = ? AND model = ?",
+                    [(now, q, cid, text_shas[cid], model) for cid in found],
+                )
+                self._db.commit()
+
+            self.hits += len(found)
+            self.misses += len(chunk_ids) - len(found)
+        return found
+
+    def put_many(self, query: str, scores: Dict[str, float], model: str, text_shas: Dict[str, str]):
+        """Store {chunk_id: score}; `text_shas` maps each chunk id to its text hash."""
+        if not scores:
+            return
+        q = normalize_query(query)
+        now = time.time()
+
+        with self._lock:
+            # Scores for an older text of the same chunk can never match again
+            self._db.executemany(
+                "DELETE FROM scores WHERE query = ? AND chunk_id = ? AND model = ? AND text_sha != ?",
+                [(q, cid, model, text_shas[cid]) for cid in scores],
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO scores (query, chunk_id, text_sha, model, score, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(q, cid, text_shas[cid], model, float(s), now) for cid, s in scores.items()],
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM scores WHERE rowid IN "
+                    "(SELECT rowid FROM scores ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
@@ -1,8 +1,29 @@
 # rag/reranker.py
-from openai import OpenAI
-from config import OPENAI_API_KEY, RERANK_MODEL, RERANK_MAX_CHARS
-
-client = OpenAI(api_key=OPENAI_API_KEY)
+import heapq
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    RERANK_MODEL,
+    RERANK_MAX_CHARS,
+    RERANKER_BACKEND,
+    RERANK_SHARD_SIZE,
+    RERANK_CONCURRENCY,
+    RERANK_MAX_RETRIES,
+    CROSS_ENCODER_MODEL,
+    RERANK_CACHE_ENABLED,
+    RERANK_CACHE_PATH,
+    RERANK_CACHE_MAX_ENTRIES,
+    LLM_BACKEND,
+)
+from embeddings.cache import text_key
+from rag.llm import make_client
+from rag.rerank_cache import RerankScoreCache
+import tracing
+
+client = make_client()
+
+_score_cache: RerankScoreCache | None = None
 
 def _clip(text: str, max_chars: int) -> str:
     text = (text or "").strip()
@@ -10,21 +31,14 @@ def _clip(text: str, max_chars: int) -> str:
         return text
     return text[:max_chars].rstrip() + "…"
 
-def rerank(query: str, hits: list[dict], top_k: int) -> list[dict]:
+def _score_shard(query: str, shard: list[dict]) -> dict[int, int]:
     """
-    LLM reranker:
-    - Input: query + candidate chunks (hits)
-    - Output: same hits but filtered/sorted by relevance
-
-    Each hit must have:
-      hit["text"], hit["meta"], hit["distance"]
+    Score one shard of candidates with the LLM.
+    Returns {shard-local index (1-based): score}; raises ValueError on unparseable output.
     """
-    if not hits:
-        return []
-
     # Build compact candidates list
     candidates = []
-    for i, h in enumerate(hits, start=1):
+    for i, h in enumerate(shard, start=1):
         m = h.get("meta", {})
         candidates.append({
             "i": i,
@@ -61,17 +75,18 @@ CANDIDATES:
         model=RERANK_MODEL,
         input=prompt,
     )
-
-    # Parse JSON safely (simple approach)
-    import json
+    tracing.current().add("prompt_chars", len(prompt))
+    tracing.add_usage(resp)
+
+    raw = (resp.output_text or "").strip()
+    # Tolerate ```json fences around the payload
+    if raw.startswith("```"):
+        raw = raw.strip("`")
+        raw = raw[raw.find("{"):]
     try:
-        data = json.loads(resp.output_text)
-        ranking = data.get("ranking", [])
-    except Exception:
-    # Fallback: keep original order, but still attach scores (0)
-        for h in hits:
-            h["rerank_score"] = 0
-        return hits[:top_k]
+        ranking = json.loads(raw).get("ranking", [])
+    except (ValueError, AttributeError) as e:
+        raise ValueError(f"Unparseable rerank output: {raw[:120]!r}") from e
 
     # Build score map
     score_by_i = {}
@@ -82,14 +97,155 @@ CANDIDATES:
             score_by_i[i] = score
         except Exception:
             continue
+    return score_by_i
+
+
+def _try_score_shard(query: str, shard: list[dict]) -> dict[int, int] | None:
+    try:
+        return _score_shard(query, shard)
+    except Exception as e:
+        print(f"⚠️ Rerank shard failed ({len(shard)} candidates): {e}")
+        return None
+
+
+def llm_rerank(query: str, hits: list[dict], top_k: int) -> list[dict]:
+    """
+    LLM reranker:
+    - Input: query + candidate chunks (hits)
+    - Output: same hits but filtered/sorted by relevance
+
+    Candidates are split into shards of RERANK_SHARD_SIZE scored concurrently
+    (RERANK_CONCURRENCY); only failed shards are retried (RERANK_MAX_RETRIES).
+    Results are merged with a heap-based top-k. Candidates whose shard never
+    succeeded keep vector-distance order below all scored ones (rerank_score=None).
+
+    Each hit must have:
+      hit["text"], hit["meta"], hit["distance"]
+    """
+    if not hits:
+        return []
+
+    size = max(1, RERANK_SHARD_SIZE)
+    shards = [list(range(i, min(i + size, len(hits)))) for i in range(0, len(hits), size)]
+
+    scores: dict[int, int] = {}
+    pending = shards
+    tracing.current().set(shards=len(shards))
+    for _attempt in range(RERANK_MAX_RETRIES + 1):
+        if not pending:
+            break
+        with ThreadPoolExecutor(max_workers=max(1, min(RERANK_CONCURRENCY, len(pending)))) as ex:
+            results = list(ex.map(
+                tracing.bind(lambda idxs: _try_score_shard(query, [hits[j] for j in idxs])),
+                pending,
+            ))
+
+        failed = []
+        for idxs, local in zip(pending, results):
+            if local is None:
+                failed.append(idxs)
+                tracing.current().add("failed_shards")
+                continue
+            # Candidates the model skipped inside a good shard score 0 (as before)
+            for pos, j in enumerate(idxs, start=1):
+                scores[j] = local.get(pos, 0)
+        pending = failed
 
-    # Attach scores and sort
     scored = []
-    for idx, h in enumerate(hits, start=1):
-        score = score_by_i.get(idx, 0)
+    for j, h in enumerate(hits):
         hh = dict(h)
-        hh["rerank_score"] = score
+        hh["rerank_score"] = scores.get(j)
         scored.append(hh)
+    return top_k_by_score(scored, top_k)
+
+
+def _rank_key(h: dict):
+    """Scored hits first (by score), then unscored ones by vector distance."""
+    dist = h.get("distance")
+    dist = dist if isinstance(dist, (int, float)) else float("inf")
+    score = h.get("rerank_score")
+    if score is not None:
+        return (1, score, -dist)
+    return (0, 0, -dist)
+
+
+def top_k_by_score(scored: list[dict], top_k: int) -> list[dict]:
+    """Heap-based top-k; nlargest is stable, so equal keys keep recall order."""
+    return heapq.nlargest(top_k, scored, key=_rank_key)
+
+
+def _cross_encoder_rerank(query: str, hits: list[dict], top_k: int) -> list[dict]:
+    # Lazy: only pull in sentence-transformers/torch when this backend is selected
+    from rag.cross_encoder import cross_encoder_rerank
+    return cross_encoder_rerank(query, hits, top_k)
+
+
+RERANKERS = {
+    "llm": llm_rerank,
+    "cross_encoder": _cross_encoder_rerank,
+}
+
+
+def get_reranker(name: str = RERANKER_BACKEND):
+    try:
+        return RERANKERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown reranker backend: {name!r} (choose from {sorted(RERANKERS)})")
 
-    scored.sort(key=lambda x: x.get("rerank_score", 0), reverse=True)
-    return scored[:top_k]
+
+def _backend_model(name: str) -> str:
+    """Model identity used in the score cache key (scores aren't comparable across models)."""
+    if name == "cross_encoder":
+        return f"cross_encoder:{CROSS_ENCODER_MODEL}"
+    # Fake scores must never be served to (or from) the real model's cache entries
+    return RERANK_MODEL if LLM_BACKEND == "openai" else f"{LLM_BACKEND}:{RERANK_MODEL}"
+
+
+def get_score_cache() -> RerankScoreCache | None:
+    global _score_cache
+    if not RERANK_CACHE_ENABLED:
+        return None
+    if _score_cache is None:
+        _score_cache = RerankScoreCache(RERANK_CACHE_PATH, max_entries=RERANK_CACHE_MAX_ENTRIES)
+    return _score_cache
+
+
+def rerank(query: str, hits: list[dict], top_k: int) -> list[dict]:
+    """
+    Rerank with the configured backend (RERANKER_BACKEND).
+
+    Scores already in the rerank score cache (query, chunk id, chunk text, model) are reused;
+    only uncached candidates go to the backend. Cached and fresh scores are
+    merged before the top-k.
+
+    Each hit must have:
+      hit["text"], hit["meta"], hit["distance"]
+    Returns the top_k hits sorted by hit["rerank_score"].
+    """
+    backend = get_reranker()
+    with tracing.span("rerank", backend=RERANKER_BACKEND, candidates=len(hits), top_k=top_k) as sp:
+        cache = get_score_cache()
+        if cache is None or not hits:
+            return backend(query, hits, top_k)
+
+        model = _backend_model(RERANKER_BACKEND)
+        text_shas = {h["id"]: text_key(h.get("text") or "") for h in hits if h.get("id")}
+        cached = cache.get_many(query, text_shas, model)
+
+        fresh_hits = [h for h in hits if h.get("id") not in cached]
+        sp.set(cache_hits=len(cached), scored=len(fresh_hits))
+        fresh_scores: dict = {}
+        if fresh_hits:
+            # Score every uncached candidate (top_k is applied after the merge)
+            for h in backend(query, fresh_hits, len(fresh_hits)):
+                if h.get("id") and h.get("rerank_score") is not None:
+                    fresh_scores[h["id"]] = h["rerank_score"]
+            cache.put_many(query, fresh_scores, model, text_shas)
+
+        scored = []
+        for h in hits:
+            hh = dict(h)
+            cid = h.get("id")
+            hh["rerank_score"] = cached.get(cid, fresh_scores.get(cid))
+            scored.append(hh)
+        return top_k_by_score(scored, top_k)
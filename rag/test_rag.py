@@ -1,8 +1,9 @@
 # rag/test_rag.py
 from __future__ import annotations
 
-from rag.rag_pipeline import answer
-from index.chroma_store import stats
+from rag.rag_pipeline import answer_stream, get_answer_cache
+from rag.reranker import get_score_cache
+from index.vector_store import stats
 from config import TOP_K
 
 
@@ -30,7 +31,7 @@ def run():
 
     # Print collection stats once (not every loop)
     s = stats()
-    print(f"📦 Chroma collection: {s['name']} | vectors={s['count']}")
+    print(f"📦 Vector collection: {s['name']} | vectors={s['count']}")
     print(f"🔎 Showing top {TOP_K} hits in debug output.\n")
 
     while True:
@@ -40,13 +41,24 @@ def run():
             continue
 
         if q.lower() in {"exit", "quit"}:
+            cache = get_answer_cache()
+            if cache is not None:
+                print(f"\n🗃️ Answer cache: {cache.stats()}")
+            score_cache = get_score_cache()
+            if score_cache is not None:
+                print(f"🗃️ Rerank score cache: {score_cache.stats()}")
             print("\n👋 Exiting RAG CLI.")
             break
 
-        text, answer_hits = answer(q)
-
+        # Print the answer as it is generated; the final event carries the hits
         print("\n--- ANSWER ---")
-        print(text)
+        answer_hits = []
+        for event in answer_stream(q):
+            if event["type"] == "delta":
+                print(event["text"], end="", flush=True)
+            else:
+                answer_hits = event["hits"]
+        print()
 
         # Display-only cleanup:
         # 1) dedupe repeated chunks
@@ -0,0 +1,265 @@
+# rag/test_stores.py
+"""
+Behavior tests for the persistent stores and caches: updates must invalidate
+what they replace, and reopening after a crash (no save / flush) must never
+serve stale or foreign data.
+
+Run: python -m pytest -q rag/test_stores.py
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+
+import numpy as np
+
+from embeddings.cache import EmbeddingCache, text_key
+from index import faiss_store
+from index.articles import ArticleIndex
+from index.lexical import LexicalIndex
+from rag.rerank_cache import RerankScoreCache
+
+
+# -----------------------------
+# Rerank score cache
+# -----------------------------
+def test_rerank_cache_changed_text_is_a_miss(tmp_path):
+    path = str(tmp_path / "rerank.sqlite")
+    cache = RerankScoreCache(path, max_entries=100)
+    old, new = text_key("Old wording of 48.12"), text_key("New wording of 48.12")
+
+    cache.put_many("safety car?", {"c1": 0.9}, "m", {"c1": old})
+    assert cache.get_many("safety car?", {"c1": old}, "m") == {"c1": 0.9}
+    assert cache.get_many("safety car?", {"c1": new}, "m") == {}
+
+    # Re-scoring the new text replaces the old row, and survives a reopen
+    cache.put_many("safety car?", {"c1": 0.2}, "m", {"c1": new})
+    reopened = RerankScoreCache(path, max_entries=100)
+    assert reopened.get_many("safety car?", {"c1": new}, "m") == {"c1": 0.2}
+    assert reopened.get_many("safety car?", {"c1": old}, "m") == {}
+    (count,) = reopened._db.execute("SELECT COUNT(*) FROM scores").fetchone()
+    assert count == 1
+
+
+def test_rerank_cache_drops_unversioned_scores(tmp_path):
+    path = str(tmp_path / "rerank.sqlite")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE scores (query TEXT, chunk_id TEXT, model TEXT, score REAL, last_used REAL, "
+        "PRIMARY KEY (query, chunk_id, model))"
+    )
+    db.execute("INSERT INTO scores VALUES ('safety car?', 'c1', 'm', 0.9, 0)")
+    db.commit()
+    db.close()
+
+    cache = RerankScoreCache(path, max_entries=100)
+    assert cache.get_many("safety car?", {"c1": text_key("anything")}, "m") == {}
+
+
+# -----------------------------
+# Embedding cache
+# -----------------------------
+def test_embedding_cache_survives_flush_and_reopen(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "m", max_entries=10)
+    cache.put_many(["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+    cache.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), "m", max_entries=10)
+    assert reopened.get_many(["a", "b", "c"]) == [[1.0, 0.0], [0.0, 1.0], None]
+
+
+def test_embedding_cache_evicted_row_misses_after_crash(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "m", max_entries=2)
+    cache.put_many(["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+    cache.flush()
+    # Evicts "a" and reuses its row; the crash comes before index.json is rewritten
+    cache.put_many(["c"], [[0.5, 0.5]])
+
+    reopened = EmbeddingCache(str(tmp_path), "m", max_entries=2)
+    assert reopened.get_many(["a", "b", "c"]) == [None, [0.0, 1.0], None]
+
+
+def test_embedding_cache_flushes_on_threshold(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "m", max_entries=10, flush_every=2, flush_seconds=3600)
+    index_path = cache.dir / "index.json"
+
+    cache.put_many(["a"], [[1.0, 0.0]])
+    cache.maybe_flush()
+    assert not index_path.exists()
+
+    cache.put_many(["b"], [[0.0, 1.0]])
+    cache.maybe_flush()
+    assert [k for k, _ in json.loads(index_path.read_text())["entries"]] == [text_key("a"), text_key("b")]
+
+
+# -----------------------------
+# Lexical index
+# -----------------------------
+def _lexical_ids(index: LexicalIndex, query: str, where=None):
+    return [h["id"] for h in index.search(query, k=10, where=where)]
+
+
+def _fill_lexical(index: LexicalIndex):
+    index.add(
+        ["c1", "c2", "c3"],
+        ["safety car deployed", "virtual safety car procedure", "tyre allocation"],
+        [{"season": "2023"}, {"season": "2024"}, {"season": "2024"}],
+    )
+    index.add(["c3"], ["safety car tyre rules"], [{"season": "2024"}])
+    index.delete(["c1"])
+
+
+def test_lexical_index_replays_log_after_crash(tmp_path):
+    _fill_lexical(LexicalIndex(str(tmp_path), "col"))
+
+    # No save(): the reopened index rebuilds from the log alone
+    reopened = LexicalIndex(str(tmp_path), "col")
+    assert reopened.count() == 2
+    assert sorted(_lexical_ids(reopened, "safety car")) == ["c2", "c3"]
+    assert _lexical_ids(reopened, "allocation") == []
+    assert _lexical_ids(reopened, "safety", where={"season": "2023"}) == []
+
+
+def test_lexical_index_save_compacts_log(tmp_path):
+    index = LexicalIndex(str(tmp_path), "col")
+    _fill_lexical(index)
+    before = index.search("safety car", k=10)
+    index.save()
+
+    with open(index.log_path, encoding="utf-8") as f:
+        assert sorted(json.loads(line)["id"] for line in f) == ["c2", "c3"]
+
+    reopened = LexicalIndex(str(tmp_path), "col")
+    assert reopened.search("safety car", k=10) == before
+
+    # Appends after a save replay on top of the snapshot
+    reopened.add(["c4"], ["safety car lights"], [{"season": "2024"}])
+    assert "c4" in _lexical_ids(LexicalIndex(str(tmp_path), "col"), "lights")
+
+
+def test_lexical_index_ignores_half_written_generation(tmp_path):
+    index = LexicalIndex(str(tmp_path), "col")
+    _fill_lexical(index)
+    index.save()
+
+    # A crash in the middle of the next save() leaves a generation CURRENT doesn't name
+    partial = index.dir / "gen-99"
+    partial.mkdir()
+    (partial / "docs.jsonl").write_text('{"op": "add", "id": "bogus"', encoding="utf-8")
+
+    reopened = LexicalIndex(str(tmp_path), "col")
+    assert sorted(_lexical_ids(reopened, "safety car")) == ["c2", "c3"]
+    assert not partial.exists()
+
+
+def test_lexical_index_migrates_flat_layout(tmp_path):
+    flat = tmp_path / "col"
+    flat.mkdir()
+    (flat / "docs.jsonl").write_text(
+        json.dumps({"op": "add", "id": "c1", "text": "safety car", "meta": {"season": "2024"}}) + "\n",
+        encoding="utf-8",
+    )
+
+    index = LexicalIndex(str(tmp_path), "col")
+    assert _lexical_ids(index, "safety") == ["c1"]
+    index.save()
+
+    assert (flat / "CURRENT").exists()
+    assert not (flat / "docs.jsonl").exists()
+    assert _lexical_ids(LexicalIndex(str(tmp_path), "col"), "safety") == ["c1"]
+
+
+# -----------------------------
+# Article index
+# -----------------------------
+def test_article_index_update_delete_and_reopen(tmp_path):
+    path = str(tmp_path / "articles.json")
+    index = ArticleIndex(path)
+    index.add(
+        ["c1", "c2"],
+        [
+            {"season": 2024, "regulation_type": "sporting", "articles": "48,48.12"},
+            {"season": 2024, "regulation_type": "sporting", "articles": "55"},
+        ],
+    )
+    # Re-indexing a chunk replaces its articles
+    index.add(["c2"], [{"season": 2024, "regulation_type": "sporting", "articles": "48.3"}])
+    index.delete(["c1"])
+    index.save()
+
+    reopened = ArticleIndex(path)
+    assert reopened.lookup("48") == ["c2"]
+    assert reopened.lookup("55") == []
+    assert reopened.lookup("48", seasons=[2023]) == []
+
+
+def test_article_index_unsaved_changes_are_lost_on_crash(tmp_path):
+    path = str(tmp_path / "articles.json")
+    index = ArticleIndex(path)
+    index.add(["c1"], [{"season": 2024, "regulation_type": "sporting", "articles": "48"}])
+    index.save()
+
+    # A PDF processed after the last save is not in the file; build_index saves
+    # before recording the PDF in the manifest, so a resume re-processes it
+    index.add(["c2"], [{"season": 2023, "regulation_type": "sporting", "articles": "48"}])
+    assert ArticleIndex(path).lookup("48") == ["c1"]
+
+    index.save()
+    assert sorted(ArticleIndex(path).lookup("48")) == ["c1", "c2"]
+
+
+# -----------------------------
+# FAISS store
+# -----------------------------
+def _unit(rng, n, dim):
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def test_faiss_store_update_delete_and_reopen(tmp_path):
+    rng = np.random.default_rng(0)
+    vecs = _unit(rng, 3, 8)
+    store = faiss_store.FaissStore(str(tmp_path), "col", quant="none")
+    store.upsert(
+        ["c1", "c2", "c3"],
+        ["one", "two", "three"],
+        vecs.tolist(),
+        [{"season": "2023"}, {"season": "2024"}, {"season": "2024"}],
+    )
+    # Update c2 in place (new text + vector), delete c3
+    store.upsert(["c2"], ["two v2"], [(-vecs[0]).tolist()], [{"season": "2024"}])
+    store.delete(["c3"])
+
+    reopened = faiss_store.FaissStore(str(tmp_path), "col", quant="none")
+    assert reopened.count() == 2
+    assert [h["text"] for h in reopened.get(["c1", "c2", "c3"])] == ["one", "two v2"]
+    top = reopened.query_many([(-vecs[0]).tolist()], k=3)[0]
+    assert [h["id"] for h in top] == ["c2", "c1"]
+    assert [h["id"] for h in reopened.query_many([vecs[0].tolist()], k=3, where={"season": "2024"})[0]] == ["c2"]
+
+
+def test_faiss_store_compact_persists_compressed_index(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    vecs = _unit(rng, 300, 16)
+    ids = [f"c{i}" for i in range(300)]
+    store = faiss_store.FaissStore(str(tmp_path), "col", quant="sq8")
+    store.upsert(ids, ids, vecs.tolist(), [{"season": "2024"}] * 300)
+    store.compact()
+    assert list(store.dir.glob("index-*.faiss"))
+
+    # A fresh process loads the trained index instead of training one
+    def no_training(*args, **kwargs):
+        raise AssertionError("compressed index was rebuilt")
+
+    reopened = faiss_store.FaissStore(str(tmp_path), "col", quant="sq8")
+    reopened.brute_force_max_rows = 0
+    monkeypatch.setattr(faiss_store.faiss, "index_factory", no_training)
+    assert reopened.query_many([vecs[7].tolist()], k=1)[0][0]["id"] == "c7"
+    monkeypatch.undo()
+
+    # Any write makes the persisted index stale: the new row must be searchable
+    new = _unit(rng, 1, 16)
+    reopened.upsert(["new"], ["new"], new.tolist(), [{"season": "2024"}])
+    again = faiss_store.FaissStore(str(tmp_path), "col", quant="sq8")
+    again.brute_force_max_rows = 0
+    assert again.query_many(new.tolist(), k=1)[0][0]["id"] == "new"
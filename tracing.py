@@ -0,0 +1,204 @@
+# tracing.py
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import TRACE_ENABLED, TRACE_EXPORT, TRACE_JSONL_PATH, TRACE_PROM_PATH
+
+# Lightweight span API for the pipeline stages:
+#
+#     with tracing.span("rerank", candidates=len(hits)) as sp:
+#         ...
+#         sp.set(cached=3)          # attributes
+#         sp.add("input_tokens", n) # numeric counters (thread-safe)
+#
+# Finished spans go to TRACE_JSONL_PATH (one JSON object per span) and/or to
+# Prometheus-style histograms written to TRACE_PROM_PATH after each root span.
+# With TRACE_ENABLED off, span() returns a shared no-op object.
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_USAGE_FIELDS = ("input_tokens", "output_tokens", "prompt_tokens", "total_tokens")
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+_lock = threading.Lock()
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, key: str, n: float = 1):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """One timed stage; parent/trace ids come from the enclosing span (contextvars)."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "start", "duration", "_t0", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        parent = _current.get()
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+        self.duration = 0.0
+
+    def __enter__(self):
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _finish(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key: str, n: float = 1):
+        with _lock:
+            self.attrs[key] = self.attrs.get(key, 0) + n
+
+
+def span(name: str, **attrs):
+    """Context manager timing one stage (no-op when TRACE_ENABLED is off)."""
+    if not TRACE_ENABLED:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def current():
+    """Innermost active span, or a no-op span."""
+    if not TRACE_ENABLED:
+        return _NOOP
+    return _current.get() or _NOOP
+
+
+def add_usage(resp: Any, target=None):
+    """Add token counts from an OpenAI response's `usage` to `target` (default: current span)."""
+    if not TRACE_ENABLED:
+        return
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return
+    target = target or current()
+    for field in _USAGE_FIELDS:
+        value = getattr(usage, field, None)
+        if isinstance(value, int):
+            target.add(field, value)
+
+
+def bind(fn: Callable) -> Callable:
+    """Run `fn` under the current span in worker threads (executors don't copy contextvars)."""
+    if not TRACE_ENABLED:
+        return fn
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # One Context can't be entered by two threads at once; copy per call
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+# -----------------------------
+# Exporters
+# -----------------------------
+_jsonl = None
+_hist: Dict[str, List[int]] = {}        # span -> per-bucket counts (last = +Inf)
+_hist_sum: Dict[str, float] = {}
+_attr_totals: Dict[Tuple[str, str], float] = {}
+
+
+def _finish(s: Span):
+    global _jsonl
+    with _lock:
+        if "jsonl" in TRACE_EXPORT:
+            if _jsonl is None:
+                _jsonl = open(TRACE_JSONL_PATH, "a", encoding="utf-8")
+            _jsonl.write(json.dumps({
+                "ts": round(s.start, 6),
+                "trace": s.trace_id,
+                "span": s.span_id,
+                "parent": s.parent_id,
+                "name": s.name,
+                "ms": round(s.duration * 1000, 3),
+                "attrs": s.attrs,
+            }, default=str) + "\n")
+            _jsonl.flush()
+
+        if "prometheus" in TRACE_EXPORT:
+            counts = _hist.setdefault(s.name, [0] * (len(_BUCKETS) + 1))
+            counts[bisect_left(_BUCKETS, s.duration)] += 1
+            _hist_sum[s.name] = _hist_sum.get(s.name, 0.0) + s.duration
+            for key, value in s.attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    _attr_totals[(s.name, key)] = _attr_totals.get((s.name, key), 0.0) + value
+
+    if "prometheus" in TRACE_EXPORT and s.parent_id is None:
+        write_prometheus()
+
+
+def prometheus_text() -> str:
+    """Current histograms / counters in the Prometheus text exposition format."""
+    lines = [
+        "# HELP rag_span_duration_seconds Duration of traced pipeline stages.",
+        "# TYPE rag_span_duration_seconds histogram",
+    ]
+    with _lock:
+        for name in sorted(_hist):
+            cumulative = 0
+            for le, n in zip([*map(str, _BUCKETS), "+Inf"], _hist[name]):
+                cumulative += n
+                lines.append(f'rag_span_duration_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'rag_span_duration_seconds_sum{{span="{name}"}} {_hist_sum[name]:.6f}')
+            lines.append(f'rag_span_duration_seconds_count{{span="{name}"}} {cumulative}')
+        lines += [
+            "# HELP rag_span_attribute_total Sum of numeric span attributes (tokens, counts, cache hits).",
+            "# TYPE rag_span_attribute_total counter",
+        ]
+        for (name, key), value in sorted(_attr_totals.items()):
+            lines.append(f'rag_span_attribute_total{{span="{name}",attr="{key}"}} {value:g}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str = TRACE_PROM_PATH):
+    """Atomic write (tmp + replace), so a textfile collector never reads half a file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+@atexit.register
+def _close():
+    if _jsonl is not None:
+        _jsonl.close()
+    if TRACE_ENABLED and "prometheus" in TRACE_EXPORT and _hist:
+        write_prometheus()